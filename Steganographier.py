@@ -33,17 +33,35 @@ import tempfile
 import threading
 import subprocess
 import string
-from hachoir.parser import createParser
-from hachoir.metadata import extractMetadata
 from natsort import ns, natsorted # windows风格的按名称排序专用包
 import time
 import argparse
 import hashlib
+import hmac
 import unicodedata
 import struct
+import array
+import zlib
+import collections
+import bisect
+import queue
+import gzip
+import atexit
+import concurrent.futures
+import contextlib
+import copy
+import glob
+import shutil
+import re
 import webbrowser
 import ctypes
 import psutil
+try:
+    import fcntl  # 仅类Unix系统提供, 用于 FICLONE 写时复制克隆
+except ImportError:
+    fcntl = None
+from Cryptodome.Cipher import AES # pyzipper 的依赖(pycryptodomex), 用于并行 WinZip-AES 加密
+from Cryptodome.Util import Counter
 
 
 
@@ -247,6 +265,14 @@ class PasswordEditor:
             if self.steganographier:
                 self.steganographier.passwords = self.steganographier.load_passwords()
                 self.show_status(f"密码本保存成功，已更新 {len(self.steganographier.passwords)} 个密码", "green")
+
+                # 同步密码命中统计: 删除已从密码本中移除的密码的记录
+                store = get_password_stats_store()
+                removed = store.sync(self.steganographier.passwords)
+                store.save()
+                if removed:
+                    self.show_status(f"密码本保存成功，已更新 {len(self.steganographier.passwords)} 个密码，"
+                                     f"清除 {removed} 个已删除密码的命中记录", "green")
             
         except Exception as e:
             self.show_status(f"保存失败: {str(e)}", "red")
@@ -325,9 +351,143 @@ class PasswordEditor:
 
 
 
+class ProgressBus:
+    """
+    引擎工作线程与Tk主线程之间的进度事件通道
+    工作线程调用 post() 只记录最新的进度参数(不接触任何Tk控件), Tk主线程通过 after() 按固定帧率取出并交给 handler 显示,
+    两帧之间的多次进度更新合并为一次; call() 投递的一次性事件(如处理完成)不合并, 在显示进度之后按顺序执行
+    """
+    FRAME_INTERVAL_MS = 50  # 每秒最多刷新20次
+
+    def __init__(self, widget, handler, interval_ms=None):
+        self.widget = widget
+        self.handler = handler
+        self.interval_ms = interval_ms or self.FRAME_INTERVAL_MS
+        self._lock = threading.Lock()
+        self._pending = None  # 尚未显示的最新进度参数
+        self._calls = collections.deque()
+        self._after_id = None
+
+    def post(self, *args):
+        """(任意线程) 提交最新进度, 覆盖尚未显示的旧进度"""
+        with self._lock:
+            self._pending = args
+
+    def call(self, func, *args):
+        """(任意线程) 投递需要在Tk主线程中执行的一次性事件"""
+        with self._lock:
+            self._calls.append((func, args))
+
+    def start(self):
+        """(Tk主线程) 开始按帧率处理事件"""
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+    def flush(self):
+        """(Tk主线程) 立即显示尚未显示的进度并执行已投递的事件"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+            calls, self._calls = self._calls, collections.deque()
+        if pending is not None:
+            self.handler(*pending)
+        for func, args in calls:
+            func(*args)
+
+    def _drain(self):
+        self._after_id = None
+        try:
+            self.flush()
+        except tk.TclError:  # 窗口已关闭
+            return
+        self._after_id = self.widget.after(self.interval_ms, self._drain)
+
+class GuiLogSink:
+    """
+    Tk文本框的批量日志输出
+    任意线程调用 write() 只把消息放入缓冲区, Tk主线程通过 after() 定期把缓冲的消息一次性插入文本框并滚动到末尾;
+    文本框最多保留 max_lines 行, 超出时删除最早的行(缓冲区同样有上限, 来不及显示的消息只计数), 完整的日志仍写入日志文件
+    """
+    FLUSH_INTERVAL_MS = 100
+    MAX_LINES = 5000
+
+    def __init__(self, text_widget, max_lines=None, interval_ms=None, readonly=False):
+        self.text = text_widget
+        self.max_lines = max_lines or self.MAX_LINES
+        self.interval_ms = interval_ms or self.FLUSH_INTERVAL_MS
+        self.readonly = readonly  # 文本框平时为 DISABLED 状态, 插入时临时打开
+        self._lock = threading.Lock()
+        self._buffer = collections.deque(maxlen=self.max_lines)
+        self._dropped = 0
+        self._after_id = None
+
+    def write(self, message):
+        """(任意线程) 缓冲一条日志"""
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append(message)
+
+    def discard(self):
+        """丢弃尚未显示的日志(清空文本框时使用)"""
+        with self._lock:
+            self._buffer.clear()
+            self._dropped = 0
+
+    def start(self):
+        """(Tk主线程) 开始定期刷新"""
+        if self._after_id is None:
+            self._after_id = self.text.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.text.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+    def flush(self):
+        """(Tk主线程) 把缓冲的日志一次性插入文本框"""
+        with self._lock:
+            lines = list(self._buffer)
+            dropped = self._dropped
+            self._buffer.clear()
+            self._dropped = 0
+        if not lines:
+            return
+        if dropped:
+            lines.insert(0, f"... 省略 {dropped} 条日志(完整内容见日志文件) ...")
+
+        if self.readonly:
+            self.text.configure(state=tk.NORMAL)
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        excess = int(self.text.index('end-1c').split('.')[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+        if self.readonly:
+            self.text.configure(state=tk.DISABLED)
+        self.text.see(tk.END)
+
+    def _drain(self):
+        self._after_id = None
+        try:
+            self.flush()
+        except tk.TclError:  # 窗口已关闭
+            return
+        self._after_id = self.text.after(self.interval_ms, self._drain)
+
 class BatchRevealProgressWindow:
     """
     批量解除隐写进度窗口
+    进度和完成状态由后台线程提交到 progress_bus, 在Tk主线程中显示
     """
     def __init__(self, parent, root_dir, main_app):
         self.parent = parent
@@ -337,6 +497,8 @@ class BatchRevealProgressWindow:
         self.progress_var = None
         self.status_var = None
         self.detail_var = None
+        self.progress_bus = None
+        self.detail_sink = None
         self.is_cancelled = False
         
     def create_progress_widgets(self):
@@ -415,8 +577,18 @@ class BatchRevealProgressWindow:
         self.close_button = ttk.Button(button_frame, text="关闭", 
                                     command=self.close_window)
 
+        # 后台线程的进度更新和处理详情由Tk主线程按帧率合并显示
+        self.progress_bus = ProgressBus(self.window, self._show_progress)
+        self.progress_bus.start()
+        self.detail_sink = GuiLogSink(self.detail_text)
+        self.detail_sink.start()
+
     def update_progress(self, current, total, current_file=""):
-        """更新进度"""
+        """更新进度(可在后台线程中调用)"""
+        if self.progress_bus and not self.is_cancelled:
+            self.progress_bus.post(current, total, current_file)
+
+    def _show_progress(self, current, total, current_file):
         if self.window and not self.is_cancelled:
             progress = (current / total) * 100 if total > 0 else 0
             self.progress_var.set(progress)
@@ -425,18 +597,18 @@ class BatchRevealProgressWindow:
                 self.status_var.set(f"处理中: {os.path.basename(current_file)} ({current}/{total})")
             else:
                 self.status_var.set(f"进度: {current}/{total}")
-                
-            self.window.update_idletasks()
     
     def add_detail(self, message):
-        """添加详细信息"""
-        if self.window and not self.is_cancelled:
-            self.detail_text.insert(tk.END, message + "\n")
-            self.detail_text.see(tk.END)
-            self.window.update_idletasks()
+        """添加详细信息(可在后台线程中调用)"""
+        if self.detail_sink and not self.is_cancelled:
+            self.detail_sink.write(message)
     
     def processing_complete(self, success_count, total_count):
-        """处理完成"""
+        """处理完成(可在后台线程中调用)"""
+        if self.progress_bus:
+            self.progress_bus.call(self._show_complete, success_count, total_count)
+
+    def _show_complete(self, success_count, total_count):
         if self.window:
             self.progress_var.set(100)
             self.status_var.set(f"处理完成: 成功 {success_count}/{total_count} 个文件")
@@ -449,8 +621,6 @@ class BatchRevealProgressWindow:
             self.add_detail(f"总计处理: {total_count} 个文件")
             self.add_detail(f"成功: {success_count} 个文件")
             self.add_detail(f"失败: {total_count - success_count} 个文件")
-            
-            self.window.update_idletasks()
     
     def cancel_processing(self):
         """取消处理"""
@@ -460,6 +630,10 @@ class BatchRevealProgressWindow:
         
     def close_window(self):
         """关闭窗口"""
+        if self.progress_bus:
+            self.progress_bus.stop()
+        if self.detail_sink:
+            self.detail_sink.stop()
         if self.window:
             self.window.destroy()
             
@@ -569,7 +743,72 @@ def format_duration(seconds):
         seconds = seconds % 60
         return f"{hours}h:{minutes:02d}m:{seconds:02d}s"
 
+def probe_mp4_duration(filepath):
+    """
+    直接读取 moov/mvhd 中的 timescale 和 duration 获取MP4时长(秒), 只读取原子头部, moov 在文件开头或末尾均可
+    无法解析时返回 None
+    """
+    with open(filepath, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+
+        def iter_atoms(start, end):
+            """依次返回 [start, end) 范围内各原子的 (类型, 数据起始位置, 原子结束位置)"""
+            pos = start
+            while pos + 8 <= end:
+                f.seek(pos)
+                header = f.read(8)
+                if len(header) < 8:
+                    return
+                size, atom_type = struct.unpack('>I4s', header)
+                header_size = 8
+                if size == 1:  # large size
+                    large_size = f.read(8)
+                    if len(large_size) < 8:
+                        return
+                    size = struct.unpack('>Q', large_size)[0]
+                    header_size = 16
+                elif size == 0:  # 原子延续到末尾
+                    size = end - pos
+                if size < header_size:
+                    return
+                yield atom_type, pos + header_size, min(pos + size, end)
+                pos += size
+
+        for atom_type, data_start, atom_end in iter_atoms(0, file_size):
+            if atom_type != b'moov':
+                continue
+            for child_type, child_start, child_end in iter_atoms(data_start, atom_end):
+                if child_type != b'mvhd':
+                    continue
+                f.seek(child_start)
+                mvhd = f.read(min(child_end - child_start, 32))
+                if len(mvhd) < 20:
+                    return None
+                if mvhd[0] == 1:  # version 1: 64位的创建/修改时间和时长
+                    if len(mvhd) < 32:
+                        return None
+                    timescale, duration = struct.unpack_from('>IQ', mvhd, 20)
+                    unknown = 0xFFFFFFFFFFFFFFFF
+                else:
+                    timescale, duration = struct.unpack_from('>II', mvhd, 12)
+                    unknown = 0xFFFFFFFF
+                if timescale == 0 or duration == unknown:
+                    return None
+                return duration // timescale
+            return None
+    return None
+
 def get_video_duration(filepath):
+    # 优先直接读取 mvhd, 失败时再使用 hachoir 完整解析(仅在需要时导入)
+    try:
+        duration = probe_mp4_duration(filepath)
+    except OSError:
+        duration = None
+    if duration is not None:
+        return duration
+
+    from hachoir.parser import createParser
+    from hachoir.metadata import extractMetadata
     parser = createParser(filepath)
     if not parser:
         return None
@@ -583,24 +822,489 @@ def get_video_duration(filepath):
         if parser.stream:
             parser.stream._input.close()
 
+EBML_MAGIC = b'\x1a\x45\xdf\xa3'               # MKV/WebM 文件开头的 EBML 头部ID
+ZIP_EOCD_SEARCH_SIZE = 65536 + 22 + 64 * 1024  # ZIP注释最长65535字节, 另外留出隐写时追加在末尾的随机化数据(最多约20KB)的空间
+
+def find_zip_end_record(f, file_size):
+    """
+    在文件末尾查找ZIP目录结束记录(只读取文件最后一段), 返回 {'base': ZIP内部偏移量的基准位置, 'cd_offset': 中央目录位置, 'entries': 成员数}
+    逐个校验候选记录(中央目录必须以 PK\x01\x02 开头), 以免把随机化数据中偶然出现的签名当作ZIP; 没有找到时返回 None
+    """
+    search_size = min(file_size, ZIP_EOCD_SEARCH_SIZE)
+    tail_start = file_size - search_size
+    f.seek(tail_start)
+    tail = f.read(search_size)
+    pos = len(tail)
+    while True:
+        pos = tail.rfind(b'PK\x05\x06', 0, pos)
+        if pos < 0:
+            return None
+        if pos + 22 > len(tail):
+            continue
+        _, _, _, _, entries, cd_size, cd_offset, _ = struct.unpack('<4s4H2LH', tail[pos:pos + 22])
+        record_pos = tail_start + pos
+        # ZIP64: 目录结束记录前依次是 ZIP64 目录结束记录(56字节)和定位器(20字节)
+        # 中央目录位置超过 ZIP64_LIMIT 时就会写入, 此时普通记录中的数值不一定是占位值, 因此总是检查定位器, 存在时以 ZIP64 记录为准
+        zip64_record = None
+        if record_pos >= 20 + 56:
+            f.seek(record_pos - 20 - 56)
+            zip64_data = f.read(20 + 56)
+            if zip64_data[56:60] == b'PK\x06\x07' and zip64_data[:4] == b'PK\x06\x06':
+                zip64_record = zip64_data
+        if zip64_record:
+            entries, _, cd_size, cd_offset = struct.unpack('<4Q', zip64_record[24:56])
+            zip64_offset = struct.unpack('<Q', zip64_record[64:72])[0]  # 定位器中 ZIP64 记录相对ZIP开头的位置
+            base = record_pos - 20 - 56 - zip64_offset
+        elif entries == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+            continue
+        else:
+            base = record_pos - cd_size - cd_offset
+        if base < 0:
+            continue
+        if entries:
+            f.seek(base + cd_offset)
+            if f.read(4) != b'PK\x01\x02':
+                continue
+        return {'base': base, 'cd_offset': cd_offset, 'entries': entries}
+
+def probe_hidden_container(file_path):
+    """
+    只读取文件头部(EBML头/顶层原子头)和末尾的ZIP目录结束记录, 判断隐写方式, 返回
+    {'type': 'mkv_attachment'|'mp4_zarchiver'|'free_atom'|'mp4_trailing', 'zip_offset': ZIP起始位置或None}; 没有找到隐写特征时返回 None
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        head = f.read(12)
+        if head[:4] == EBML_MAGIC:
+            return {'type': 'mkv_attachment', 'zip_offset': None}
+
+        large_free_atom = False
+        if head[4:8] == b'ftyp':
+            # ZArchiver模式: free 原子的数据以ZIP本地文件头开头
+            for atom in read_mp4_atoms(file_path):
+                if atom['type'] != 'free' or atom['size'] < atom['header_size'] + 4:
+                    continue
+                data_offset = atom['offset'] + atom['header_size']
+                f.seek(data_offset)
+                if f.read(4) == b'PK\x03\x04':
+                    return {'type': 'mp4_zarchiver', 'zip_offset': data_offset}
+                if atom['size'] > 1024:
+                    large_free_atom = True
+
+        # 普通MP4模式: ZIP附加在视频末尾(之后可能还有随机化数据)
+        end_record = find_zip_end_record(f, file_size)
+        if end_record:
+            return {'type': 'mp4_trailing', 'zip_offset': end_record['base']}
+
+    # 旧版本的 free 原子方法: 较大的 free 原子中存放其他格式的数据(外壳视频自带的填充原子也可能较大, 因此最后判断)
+    if large_free_atom:
+        return {'type': 'free_atom', 'zip_offset': None}
+    return None
+
+# Matroska 元素ID(保留长度标记位)
+MKV_EBML_ID = 0x1A45DFA3
+MKV_SEGMENT_ID = 0x18538067
+MKV_SEEKHEAD_ID = 0x114D9B74
+MKV_SEEK_ID = 0x4DBB
+MKV_SEEK_ID_ID = 0x53AB
+MKV_SEEK_POSITION_ID = 0x53AC
+MKV_ATTACHMENTS_ID = 0x1941A469
+MKV_ATTACHED_FILE_ID = 0x61A7
+MKV_FILE_NAME_ID = 0x466E
+MKV_FILE_MIME_TYPE_ID = 0x4660
+MKV_FILE_DATA_ID = 0x465C
+MKV_FILE_UID_ID = 0x46AE
+MKV_CLUSTER_ID = 0x1F43B675
+MKV_VOID_ID = 0xEC
+MKV_CRC32_ID = 0xBF
+MKV_ATTACHMENT_CHUNK_SIZE = 1024 * 1024 * 1024  # MKV模式下每个附件最多存放的ZIP数据量(常用工具不支持超过2GB的单个附件)
+
+def read_ebml_element_header(f):
+    """
+    读取一个EBML元素头部, 返回 (元素ID, 数据大小); 大小未知时数据大小为 None, 到达文件末尾时返回 None
+    """
+    first = f.read(1)
+    if not first or first[0] < 0x10:  # 元素ID最长4字节
+        return None
+    id_length = 9 - first[0].bit_length()
+    rest = f.read(id_length - 1)
+    if len(rest) < id_length - 1:
+        return None
+    element_id = int.from_bytes(first + rest, 'big')
+
+    first = f.read(1)
+    if not first or first[0] == 0:
+        return None
+    size_length = 9 - first[0].bit_length()
+    rest = f.read(size_length - 1)
+    if len(rest) < size_length - 1:
+        return None
+    size = int.from_bytes(bytes([first[0] & (0xFF >> size_length)]) + rest, 'big')
+    if size == (1 << (7 * size_length)) - 1:  # 所有数据位均为1表示大小未知
+        size = None
+    return element_id, size
+
+def iter_ebml_children(f, start, end):
+    """遍历 [start, end) 范围内的子元素, 依次返回 (元素ID, 数据起始位置, 数据大小)"""
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        header = read_ebml_element_header(f)
+        if header is None or header[1] is None:
+            return
+        element_id, size = header
+        data_start = f.tell()
+        yield element_id, data_start, size
+        pos = data_start + size
+
+def read_mkv_attachments(file_path):
+    """
+    读取MKV文件中的附件列表(不调用 mkvinfo/mkvextract), 按文件中的顺序返回
+    [{'name': 文件名, 'mime': MIME类型, 'offset': 附件数据在文件中的起始位置, 'size': 附件数据大小}, ...]
+    优先通过 SeekHead 直接定位 Attachments 元素, 否则按顶层元素大小逐个跳过查找
+    """
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        header = read_ebml_element_header(f)
+        if header is None or header[0] != MKV_EBML_ID or header[1] is None:
+            return []
+        f.seek(header[1], io.SEEK_CUR)
+        header = read_ebml_element_header(f)
+        if header is None or header[0] != MKV_SEGMENT_ID:
+            return []
+        segment_start = f.tell()
+        segment_end = file_size if header[1] is None else min(file_size, segment_start + header[1])
+
+        def read_element_at(pos):
+            f.seek(pos)
+            header = read_ebml_element_header(f)
+            return (header[0], f.tell(), header[1]) if header else (None, pos, None)
+
+        attachments_range = None
+        pos = segment_start
+        while pos < segment_end and attachments_range is None:
+            element_id, data_start, size = read_element_at(pos)
+            if element_id is None or size is None:  # 大小未知的元素(如直播录制的Cluster)无法跳过
+                break
+            if element_id == MKV_ATTACHMENTS_ID:
+                attachments_range = (data_start, data_start + size)
+            elif element_id == MKV_SEEKHEAD_ID:
+                for seek_id, seek_start, seek_size in iter_ebml_children(f, data_start, data_start + size):
+                    if seek_id != MKV_SEEK_ID:
+                        continue
+                    target_id = target_pos = None
+                    for child_id, child_start, child_size in iter_ebml_children(f, seek_start, seek_start + seek_size):
+                        f.seek(child_start)
+                        value = f.read(child_size)
+                        if child_id == MKV_SEEK_ID_ID:
+                            target_id = int.from_bytes(value, 'big')
+                        elif child_id == MKV_SEEK_POSITION_ID:
+                            target_pos = int.from_bytes(value, 'big')
+                    if target_id == MKV_ATTACHMENTS_ID and target_pos is not None:
+                        target = read_element_at(segment_start + target_pos)
+                        if target[0] == MKV_ATTACHMENTS_ID and target[2] is not None:
+                            attachments_range = (target[1], target[1] + target[2])
+                        break
+            pos = data_start + size
+
+        if attachments_range is None:
+            return []
+
+        attachments = []
+        for element_id, data_start, size in iter_ebml_children(f, *attachments_range):
+            if element_id != MKV_ATTACHED_FILE_ID:
+                continue
+            attachment = {'name': '', 'mime': '', 'offset': None, 'size': 0}
+            for child_id, child_start, child_size in iter_ebml_children(f, data_start, data_start + size):
+                if child_id == MKV_FILE_NAME_ID:
+                    f.seek(child_start)
+                    attachment['name'] = f.read(child_size).decode('utf-8', errors='replace').rstrip('\x00')
+                elif child_id == MKV_FILE_MIME_TYPE_ID:
+                    f.seek(child_start)
+                    attachment['mime'] = f.read(child_size).decode('ascii', errors='replace').rstrip('\x00')
+                elif child_id == MKV_FILE_DATA_ID:
+                    attachment['offset'], attachment['size'] = child_start, child_size
+            if attachment['offset'] is not None:
+                attachments.append(attachment)
+        return attachments
+
+def join_mkv_attachment_chunks(attachments):
+    """
+    把分块存放的附件拼接起来: 第一个附件名为 name.001 或 name 时, 其后依次名为 name.002, name.003... 的附件都属于同一个文件
+    返回 (文件名, [(数据起始位置, 数据结束位置), ...])
+    """
+    first = attachments[0]
+    name = first['name'][:-4] if first['name'].endswith('.001') else first['name']
+    ranges = [(first['offset'], first['offset'] + first['size'])]
+    for number, attachment in enumerate(attachments[1:], start=2):
+        if attachment['name'] != f"{name}.{number:03d}":
+            break
+        ranges.append((attachment['offset'], attachment['offset'] + attachment['size']))
+    return name, ranges
+
+def encode_ebml_element_header(element_id, size, size_length=8):
+    """生成EBML元素头部, 数据大小固定用 size_length 字节编码, 便于写完数据后原位回填"""
+    return (element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+            + ((1 << (7 * size_length)) | size).to_bytes(size_length, 'big'))
+
+def encode_ebml_element(element_id, data):
+    return encode_ebml_element_header(element_id, len(data)) + data
+
+def read_mkv_layout(file_path):
+    """
+    读取在Matroska文件末尾追加附件所需的结构, 返回
+    {'segment_size_offset': Segment大小字段位置, 'segment_size_length': 其字节数, 'segment_start': Segment数据起始位置,
+     'seekhead': (元素位置, 数据起始位置, 数据大小)或None, 'void': 紧跟在SeekHead之后的Void元素(元素位置, 总长度)或None}
+    不是Matroska文件、Segment之后还有其他数据或已经带有附件时返回 None
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        header = read_ebml_element_header(f)
+        if header is None or header[0] != MKV_EBML_ID or header[1] is None:
+            return None
+        f.seek(header[1], io.SEEK_CUR)
+        segment_offset = f.tell()
+        header = read_ebml_element_header(f)
+        if header is None or header[0] != MKV_SEGMENT_ID:
+            return None
+        segment_start = f.tell()
+        if header[1] is not None and segment_start + header[1] != file_size:
+            return None
+        layout = {
+            'segment_size_offset': segment_offset + 4,
+            'segment_size_length': segment_start - segment_offset - 4,
+            'segment_start': segment_start,
+            'seekhead': None,
+            'void': None,
+        }
+
+        # SeekHead及预留的Void元素都位于第一个Cluster之前
+        pos = segment_start
+        while pos < file_size:
+            f.seek(pos)
+            header = read_ebml_element_header(f)
+            if header is None or header[1] is None or header[0] == MKV_CLUSTER_ID:
+                break
+            element_id, size = header
+            data_start = f.tell()
+            if element_id == MKV_ATTACHMENTS_ID:
+                return None
+            if element_id == MKV_SEEKHEAD_ID and layout['seekhead'] is None:
+                layout['seekhead'] = (pos, data_start, size)
+            elif (element_id == MKV_VOID_ID and layout['seekhead'] and layout['void'] is None
+                  and layout['seekhead'][1] + layout['seekhead'][2] == pos):
+                layout['void'] = (pos, data_start + size - pos)
+            pos = data_start + size
+
+    if read_mkv_attachments(file_path):  # 附件位于Cluster之后的情况
+        return None
+    return layout
+
+def build_mkv_seekhead_patch(f, layout, attachments_position):
+    """
+    生成加入 Attachments 定位项后的 SeekHead(及剩余的Void元素), 总长度与原 SeekHead 和其后的 Void 元素相同, 可以原位覆盖
+    f 为外壳文件, attachments_position 为 Attachments 相对 Segment 数据起点的位置; 没有可用的预留空间时返回 None
+    """
+    if not layout['seekhead'] or not layout['void']:
+        return None
+    seekhead_offset, data_start, size = layout['seekhead']
+    void_offset, void_length = layout['void']
+    f.seek(data_start)
+    content = f.read(size)
+
+    # 原有的 CRC-32 元素在加入定位项后重新计算
+    has_crc = content[:2] == b'\xbf\x84'
+    if has_crc:
+        content = content[6:]
+    content += encode_ebml_element(MKV_SEEK_ID,
+                                   encode_ebml_element(MKV_SEEK_ID_ID, MKV_ATTACHMENTS_ID.to_bytes(4, 'big'))
+                                   + encode_ebml_element(MKV_SEEK_POSITION_ID, attachments_position.to_bytes(8, 'big')))
+    if has_crc:
+        content = encode_ebml_element_header(MKV_CRC32_ID, 4, size_length=1) + struct.pack('<I', zlib.crc32(content)) + content
+    seekhead = encode_ebml_element(MKV_SEEKHEAD_ID, content)
+
+    # 剩余空间重新写成 Void 元素(头部至少2字节)
+    remaining = void_offset + void_length - seekhead_offset - len(seekhead)
+    if remaining == 0:
+        return seekhead
+    if 2 <= remaining < 129:
+        return seekhead + encode_ebml_element_header(MKV_VOID_ID, remaining - 2, size_length=1) + bytes(remaining - 2)
+    if remaining >= 129:
+        return seekhead + encode_ebml_element_header(MKV_VOID_ID, remaining - 9) + bytes(remaining - 9)
+    return None
+
+mkv_cover_cache_lock = threading.Lock()  # MP4外壳转换为MKV外壳时的缓存锁
+
+def read_mp4_atoms(file_path):
+    """读取MP4文件的顶层原子结构, 返回各原子的类型、大小、偏移和头部大小"""
+    atoms = []
+    with open(file_path, 'rb') as f:
+        while True:
+            # 读取原子头部（8字节：4字节大小 + 4字节类型）
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            
+            size = struct.unpack('>I', header[:4])[0]
+            atom_type = header[4:8].decode('ascii', errors='ignore')
+            
+            # 处理large size情况
+            if size == 1:
+                large_size = f.read(8)
+                if len(large_size) < 8:
+                    break
+                large_size = struct.unpack('>Q', large_size)[0]
+                if large_size < 16:  # 无效的原子大小, 停止解析以免死循环
+                    break
+                atoms.append({
+                    'type': atom_type,
+                    'size': large_size,
+                    'offset': f.tell() - 16,
+                    'header_size': 16
+                })
+                f.seek(f.tell() + large_size - 16)
+            elif size == 0:
+                # 原子延续到文件末尾
+                current_pos = f.tell()
+                f.seek(0, 2)  # 跳到文件末尾
+                file_size = f.tell()
+                atoms.append({
+                    'type': atom_type,
+                    'size': file_size - current_pos + 8,
+                    'offset': current_pos - 8,
+                    'header_size': 8
+                })
+                break
+            elif size < 8:  # 无效的原子大小, 停止解析以免死循环
+                break
+            else:
+                atoms.append({
+                    'type': atom_type,
+                    'size': size,
+                    'offset': f.tell() - 8,
+                    'header_size': 8
+                })
+                f.seek(f.tell() + size - 8)
+    
+    return atoms
+
+class CoverVideoInfoCache:
+    """
+    外壳视频信息的磁盘缓存(JSON), 以文件绝对路径为键, 文件大小或修改时间变化时重新解析
+    每个条目保存时长、大小和顶层原子结构; 条目数超过上限时淘汰最久未使用的条目
+    """
+    MAX_ENTRIES = 5000
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.entries = None  # 首次使用时加载, 按最近使用顺序排列
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        self.entries = collections.OrderedDict()
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == 1:
+                self.entries.update(data.get('entries', {}))
+        except (OSError, ValueError, AttributeError):
+            pass  # 缓存不存在或已损坏时从空缓存开始
+        self._evict()
+
+    def _evict(self):
+        while len(self.entries) > self.MAX_ENTRIES:
+            self.entries.popitem(last=False)
+            self.dirty = True
+
+    def get(self, filepath):
+        """返回视频信息 {'size', 'mtime_ns', 'duration_seconds', 'atoms'}, 缓存未命中时解析文件"""
+        key = os.path.abspath(filepath)
+        stat = os.stat(key)
+        with self.lock:
+            if self.entries is None:
+                self._load()
+            entry = self.entries.get(key)
+            if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+                self.entries.move_to_end(key)
+                return entry
+
+        # 解析在锁外进行, 不阻塞其他线程的缓存查询
+        try:
+            atoms = read_mp4_atoms(key)
+        except OSError:
+            atoms = []
+        try:
+            duration_seconds = get_video_duration(key)
+        except Exception as e:
+            print(f"读取视频时长失败: {key}, {e}")
+            duration_seconds = None
+        entry = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'duration_seconds': duration_seconds,
+            'atoms': atoms,
+        }
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.dirty = True
+            self._evict()
+        return entry
+
+    def save(self):
+        """有变化时写回缓存文件(先写临时文件再替换, 避免中途退出留下损坏的缓存)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'version': 1, 'entries': self.entries}
+            temp_file = self.cache_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_file, self.cache_file)
+                self.dirty = False
+            except OSError as e:
+                print(f"外壳视频信息缓存保存失败: {e}")
+
+cover_video_info_cache = None  # 首次使用时创建, 缓存文件位于 modules 目录
+
+def get_cover_video_info_cache():
+    global cover_video_info_cache
+    if cover_video_info_cache is None:
+        cover_video_info_cache = CoverVideoInfoCache(os.path.join(application_path, 'modules', 'cover_video_cache.json'))
+    return cover_video_info_cache
+
+def get_cover_video_info(filepath, save=True):
+    """通过缓存获取单个外壳视频的信息(时长、大小、原子结构)"""
+    cache = get_cover_video_info_cache()
+    info = cache.get(filepath)
+    if save:
+        cache.save()
+    return info
+
 def get_cover_video_files_info(folder_path, sort_by_duration=False):
     try:
+        cache = get_cover_video_info_cache()
         videos = []
         for filename in os.listdir(folder_path):
             if filename.endswith(".mp4"):
                 filepath = os.path.join(folder_path, filename)
-                duration_seconds = get_video_duration(filepath)
+                info = cache.get(filepath)  # 时长等信息优先从缓存读取, 文件变化后才重新解析
+                duration_seconds = info['duration_seconds']
                 if duration_seconds is None:
                     formatted_duration = "Unknown"
                 else:
                     formatted_duration = format_duration(duration_seconds)
-                size = get_file_or_folder_size(filepath)  # 获取文件/文件夹大小
+                size = info['size']  # 获取文件大小
                 videos.append({
                     "filename": filename,
                     "duration": formatted_duration,
                     "duration_seconds": duration_seconds or 0,  # 时长未知则为0
                     "size": format_size(size)
                 })
+        cache.save()
 
         # 先按Windows显示风格排序
         videos = list(natsorted(videos, key=lambda x: x['filename'], alg=ns.PATH)) 
@@ -618,6 +1322,186 @@ def get_cover_video_files_info(folder_path, sort_by_duration=False):
         print(f"An error occurred: {e}")
         return []
 
+class CoverVideoIndex:
+    """
+    外壳视频索引: 扫描一次文件夹后提供名称顺序、时长顺序和不重复随机三种选择方式, 每次选择为 O(1)
+    时长顺序在首次使用时才通过外壳视频信息缓存计算, 名称顺序和随机模式不需要解析视频
+    """
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        # 按Windows显示风格排序
+        self.by_name = natsorted([f for f in os.listdir(folder_path) if f.endswith(".mp4")], alg=ns.PATH)
+        self._by_duration = None
+        self._random_pool = []  # 随机选择模式时的剩余外壳文件列表
+
+    def __len__(self):
+        return len(self.by_name)
+
+    @property
+    def by_duration(self):
+        """按时长降序排列(时长相同时保持名称顺序, 与下拉菜单的排序一致)"""
+        if self._by_duration is None:
+            cache = get_cover_video_info_cache()
+            durations = {filename: cache.get(os.path.join(self.folder_path, filename))['duration_seconds'] or 0
+                         for filename in self.by_name}
+            cache.save()
+            self._by_duration = sorted(self.by_name, key=lambda filename: durations[filename], reverse=True)
+        return self._by_duration
+
+    def pick_by_name(self, index):
+        return self.by_name[index % len(self.by_name)]
+
+    def pick_by_duration(self, index):
+        by_duration = self.by_duration
+        return by_duration[index % len(by_duration)]
+
+    def pick_random(self):
+        """随机选择, 所有外壳文件都用过一轮之前不会重复"""
+        if not self._random_pool:
+            self._random_pool = list(self.by_name)
+            random.shuffle(self._random_pool)  # 随机排序
+        return self._random_pool.pop()
+
+def password_stats_contexts(file_path, zip_comment=None):
+    """
+    返回隐写文件的密码统计上下文 [(上下文键, 权重), ...]: 所在文件夹、文件名模式(数字替换为#), 以及ZIP注释中的隐写日期
+    同一文件夹、同一批命名或同一天隐写的文件通常使用同一个密码
+    """
+    file_path = os.path.abspath(file_path)
+    name_pattern = re.sub(r'\d+', '#', os.path.splitext(os.path.basename(file_path))[0].lower())
+    contexts = [
+        ('dir:' + os.path.normcase(os.path.dirname(file_path)), 4),
+        ('name:' + name_pattern, 2),
+    ]
+    if zip_comment:
+        match = re.search(rb"Timestamp '(\d{4}-\d{2}-\d{2})", zip_comment)
+        if match:
+            contexts.append(('day:' + match.group(1).decode('ascii'), 3))
+    return contexts
+
+class PasswordStatsStore:
+    """
+    密码命中统计(JSON): 记录每个密码在各上下文(见 password_stats_contexts)中成功解除隐写的次数和最近时间, 用于对密码本排序
+    密码以加盐 SHA-256 保存, 统计文件中不出现明文密码; 上下文数超过上限时淘汰最久未使用的上下文
+    """
+    MAX_CONTEXTS = 2000
+    GLOBAL_CONTEXT = '*'  # 不区分上下文的总计, 权重为1
+
+    def __init__(self, stats_file):
+        self.stats_file = stats_file
+        self.salt = None
+        self.contexts = None  # 首次使用时加载, {上下文键: {密码哈希: {'hits': 次数, 'last': 时间戳}}}, 按最近使用顺序排列
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        self.contexts = collections.OrderedDict()
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == 1:
+                self.salt = bytes.fromhex(data['salt'])
+                self.contexts.update(data.get('contexts', {}))
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass  # 统计文件不存在或已损坏时从空统计开始
+        if self.salt is None:
+            self.salt = os.urandom(16)
+            self.contexts.clear()
+        self._evict()
+
+    def _ensure_loaded(self):
+        if self.contexts is None:
+            self._load()
+
+    def _evict(self):
+        while len(self.contexts) > self.MAX_CONTEXTS + 1:
+            for key in self.contexts:
+                if key != self.GLOBAL_CONTEXT:
+                    del self.contexts[key]
+                    break
+            self.dirty = True
+
+    def _hash(self, password):
+        return hashlib.sha256(self.salt + password.encode('utf-8')).hexdigest()[:32]
+
+    def rank(self, password_list, contexts, pinned=None):
+        """
+        按命中统计对密码排序: 各上下文命中次数×权重之和越大越靠前, 相同时最近命中的优先, 没有记录的密码保持原顺序排在后面
+        pinned(用户指定的密码)始终排在最前
+        """
+        with self.lock:
+            self._ensure_loaded()
+            scores = {}
+            for context, weight in [(self.GLOBAL_CONTEXT, 1)] + list(contexts):
+                for password_hash, stats in self.contexts.get(context, {}).items():
+                    score, last = scores.get(password_hash, (0, 0))
+                    scores[password_hash] = (score + weight * stats['hits'], max(last, stats['last']))
+            if not scores:
+                return list(password_list)
+
+            def sort_key(item):
+                index, password = item
+                if pinned and password == pinned:
+                    return (0, 0, 0, index)
+                score, last = scores.get(self._hash(password), (0, 0))
+                return (1, -score, -last, index)
+            return [password for _, password in sorted(enumerate(password_list), key=sort_key)]
+
+    def record_hit(self, password, contexts):
+        """记录一次成功解除隐写"""
+        now = time.time()
+        with self.lock:
+            self._ensure_loaded()
+            password_hash = self._hash(password)
+            for context, _ in [(self.GLOBAL_CONTEXT, 1)] + list(contexts):
+                stats = self.contexts.setdefault(context, {}).setdefault(password_hash, {'hits': 0, 'last': 0})
+                stats['hits'] += 1
+                stats['last'] = now
+                self.contexts.move_to_end(context)
+            self.dirty = True
+            self._evict()
+
+    def sync(self, passwords):
+        """密码本修改后调用: 删除已不在密码本中的密码的统计, 返回删除的密码数"""
+        with self.lock:
+            self._ensure_loaded()
+            keep = {self._hash(password) for password in passwords}
+            removed = set()
+            for context in list(self.contexts):
+                stats = self.contexts[context]
+                for password_hash in [h for h in stats if h not in keep]:
+                    del stats[password_hash]
+                    removed.add(password_hash)
+                if not stats:
+                    del self.contexts[context]
+            if removed:
+                self.dirty = True
+            return len(removed)
+
+    def save(self):
+        """有变化时写回统计文件(先写临时文件再替换, 避免中途退出留下损坏的文件)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'version': 1, 'salt': self.salt.hex(), 'contexts': self.contexts}
+            temp_file = self.stats_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_file, self.stats_file)
+                self.dirty = False
+            except OSError as e:
+                print(f"密码命中统计保存失败: {e}")
+
+password_stats_store = None  # 首次使用时创建, 统计文件位于 modules 目录
+
+def get_password_stats_store():
+    global password_stats_store
+    if password_stats_store is None:
+        password_stats_store = PasswordStatsStore(os.path.join(application_path, 'modules', 'password_stats.json'))
+    return password_stats_store
+
 def get_file_or_folder_size(path):
     total_size = 0
     if os.path.isfile(path):
@@ -629,6 +1513,142 @@ def get_file_or_folder_size(path):
                 total_size += os.path.getsize(fp)
     return total_size
 
+def collect_input_files(path):
+    """
+    一次遍历收集需要压缩的文件, 返回 ([(文件完整路径, 压缩包内名称, 文件大小), ...], 总大小)
+    文件夹按 os.walk 顺序、同一目录内按文件名排序, 该顺序同时用于合成文件夹的 SHA-256
+    """
+    file_list = []
+    total_size = 0
+    if os.path.isdir(path):
+        root_folder = os.path.basename(path)
+        for root, dirs, files in os.walk(path):
+            for file in sorted(files):
+                file_full_path = os.path.join(root, file)
+                arcname = os.path.join(root_folder, os.path.relpath(file_full_path, start=path))
+                size = os.path.getsize(file_full_path)
+                file_list.append((file_full_path, arcname, size))
+                total_size += size
+    elif os.path.isfile(path):
+        size = os.path.getsize(path)
+        file_list.append((path, os.path.basename(path), size))
+        total_size = size
+    return file_list, total_size
+
+def random_zip_date_time():
+    """随机生成ZIP成员的文件日期和时间"""
+    while True:
+        try:
+            date_time = (
+                random.randint(1980, 2099),  # 年
+                random.randint(1, 12),       # 月
+                random.randint(1, 28),       # 日
+                random.randint(0, 23),       # 时
+                random.randint(0, 59),       # 分
+                random.randint(0, 59)        # 秒
+            )
+            datetime.datetime(*date_time)
+            return date_time
+        except ValueError:
+            continue
+
+def add_to_offset_table(buf, offset, count, width, adjustment):
+    """
+    将 buf[offset:] 处 count 个大端 width(4或8)字节无符号整数统一加上 adjustment, 原地修改 bytearray
+    先用 array 在C层求出最大/最小值确认没有任何一项溢出, 再把整张表视为一个大整数,
+    一次性加上(或减去)每一项都等于 adjustment 的重复常数; 各项之间不会产生进位/借位, 因此结果与逐项相加一致
+    会溢出时不修改数据并返回 False
+    """
+    if count == 0 or adjustment == 0:
+        return True
+    end = offset + count * width
+    table = array.array('I' if width == 4 else 'Q', buf[offset:end])
+    if sys.byteorder == 'little':
+        table.byteswap()
+    if adjustment > 0 and max(table) + adjustment >= 1 << (8 * width):
+        return False
+    if adjustment < 0 and min(table) + adjustment < 0:
+        return False
+    repeated = int.from_bytes(abs(adjustment).to_bytes(width, 'big') * count, 'big')
+    value = int.from_bytes(buf[offset:end], 'big')
+    value = value + repeated if adjustment > 0 else value - repeated
+    buf[offset:end] = value.to_bytes(end - offset, 'big')
+    return True
+
+FICLONE = 0x40049409                        # Linux ioctl: 整文件写时复制克隆(reflink)
+FILE_COPY_SLICE_SIZE = 64 * 1024 * 1024     # 内核复制时每次调用的最大字节数, 用于更新进度
+
+def copy_file_data(src_file, dst_file, length=None, progress=None):
+    """
+    从 src_file 的当前位置复制 length 字节(默认到文件末尾)到 dst_file 的当前位置, 两者的位置随后移到复制结束处
+    依次尝试: 'reflink'(FICLONE, btrfs/XFS等写时复制文件系统, 仅在把整个文件复制到空文件开头时可用)、
+    'copy_file_range'、'sendfile'(数据在内核中复制, 不经过Python), 都不可用时回退到 'buffered' 分块读写
+    progress 为进度回调, 参数为本次新复制的字节数; 返回实际使用的复制方式
+    """
+    src_pos = src_file.tell()
+    dst_file.flush()
+    dst_pos = dst_file.tell()
+    src_fd = src_file.fileno()
+    dst_fd = dst_file.fileno()
+    available = max(os.fstat(src_fd).st_size - src_pos, 0)
+    length = available if length is None else min(length, available)
+    copied = 0
+    method = 'buffered'
+
+    def report(size):
+        nonlocal copied
+        copied += size
+        if progress:
+            progress(size)
+
+    # 1. 写时复制克隆: 只修改元数据, 几乎不产生实际I/O
+    if fcntl and length > 0 and src_pos == 0 and dst_pos == 0 and length == available \
+            and os.fstat(dst_fd).st_size == 0:
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            report(length)
+            method = 'reflink'
+        except OSError:
+            pass  # 文件系统不支持或跨文件系统
+
+    # 2. 内核复制: 某种方式中途失败时, 下一种方式从已复制的位置继续
+    def copy_range(count):
+        return os.copy_file_range(src_fd, dst_fd, count, src_pos + copied, dst_pos + copied)
+
+    def send_file(count):
+        os.lseek(dst_fd, dst_pos + copied, os.SEEK_SET)
+        return os.sendfile(dst_fd, src_fd, src_pos + copied, count)
+
+    for name, copy_func, supported in (('copy_file_range', copy_range, hasattr(os, 'copy_file_range')),
+                                       ('sendfile', send_file, hasattr(os, 'sendfile'))):
+        if copied >= length or not supported:
+            continue
+        try:
+            while copied < length:
+                size = copy_func(min(length - copied, FILE_COPY_SLICE_SIZE))
+                if size == 0:
+                    break
+                method = name
+                report(size)
+        except OSError:
+            continue  # 例如旧内核跨文件系统、Windows/macOS 上的 sendfile 不支持普通文件
+
+    # 3. 缓冲区读写
+    if copied < length:
+        src_file.seek(src_pos + copied)
+        dst_file.seek(dst_pos + copied)
+        while copied < length:
+            data = src_file.read(min(length - copied, 8 * 1024 * 1024))
+            if not data:
+                break
+            dst_file.write(data)
+            method = 'buffered'
+            report(len(data))
+
+    src_file.seek(src_pos + copied)
+    dst_file.seek(dst_pos + copied)
+    return method
+
 def format_size(size):
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
         if size < 1024:
@@ -654,12 +1674,1043 @@ def check_size_and_duration(size, duration_seconds):
         return False
     return True
 
+class AsyncLogWriter:
+    """
+    后台线程写入的日志文件: write() 只把记录放入队列, 格式化和文件I/O都在后台线程中批量完成, 不阻塞隐写/解除隐写流程
+    json_lines 为 True 时每条记录写成一行JSON(time、message 以及 job/stage/bytes/duration 等附加字段), 否则写成带时间戳的文本行
+    文本日志带BOM(与原来的日志文件一致), JSON Lines 日志不带BOM, 以便逐行 json.loads
+    文件超过 max_bytes 时压缩为 <文件名>.<序号>.<扩展名>.gz 并重新开始; 日志目录中超过 max_age_days 天或超出 backup_count 个的压缩日志被删除,
+    之前运行留下的、一天以上未修改的未压缩日志会被压缩
+    """
+    MAX_BYTES = 20 * 1024 * 1024
+    BACKUP_COUNT = 30
+    MAX_AGE_DAYS = 30
+    STALE_LOG_SECONDS = 24 * 3600  # 未压缩日志超过这个时间未修改才视为其他进程已经结束
+    BATCH_SIZE = 1000              # 后台线程每次最多连续写入的记录数
+
+    def __init__(self, file_path, json_lines=False, max_bytes=None, backup_count=None, max_age_days=None):
+        self.file_path = file_path
+        self.json_lines = json_lines
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.backup_count = backup_count or self.BACKUP_COUNT
+        self.max_age_days = max_age_days or self.MAX_AGE_DAYS
+        self._queue = queue.SimpleQueue()
+        self._rotation = 0
+        self._closed = False
+        self._fp = self._open('w')  # 在调用线程中打开, 出错时直接抛出
+        self._thread = threading.Thread(target=self._run, name='AsyncLogWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)  # 程序退出前写完队列中的记录
+
+    def write(self, message, **fields):
+        """(任意线程) 提交一条日志记录"""
+        self._queue.put((time.time(), message, fields))
+
+    def write_raw(self, text):
+        """(任意线程) 原样写入一段文本(日志头尾等)"""
+        self._queue.put((None, text, None))
+
+    def close(self):
+        """写完队列中的记录后关闭文件, 可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self, mode):
+        # 追加写入时不能再写BOM
+        encoding = 'utf-8-sig' if mode == 'w' and not self.json_lines else 'utf-8'
+        return open(self.file_path, mode, encoding=encoding)
+
+    def _format(self, record):
+        created, message, fields = record
+        if created is None:
+            return message
+        if self.json_lines:
+            entry = {'time': datetime.datetime.fromtimestamp(created).isoformat(timespec='milliseconds'), 'message': message}
+            entry.update(fields)
+            return json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        line = f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created))}] {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line + "\n"
+
+    def _run(self):
+        self._cleanup_old_logs()
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if self._fp.closed:
+                # 之前的轮转在重新打开文件时失败, 写入这一批记录之前追加打开原文件继续记录
+                try:
+                    self._fp = self._open('a')
+                except OSError as e:
+                    sys.stderr.write(f"重新打开日志文件失败: {e}\n")
+            for record in batch:
+                if record is None:
+                    self._fp.close()
+                    return
+                try:
+                    self._fp.write(self._format(record))
+                except Exception as e:
+                    sys.stderr.write(f"写入日志文件失败: {e}\n")
+            try:
+                self._fp.flush()
+                if os.fstat(self._fp.fileno()).st_size >= self.max_bytes:
+                    self._rotate()
+            except Exception as e:
+                # 任何异常都不能让后台线程退出, 否则之后的记录会一直堆积在队列中
+                sys.stderr.write(f"日志文件轮转失败: {e}\n")
+
+    def _rotate(self):
+        """先改名并打开新文件, 再压缩改名后的文件; 压缩失败时保留未压缩的文件, 不影响继续写入"""
+        root, ext = os.path.splitext(self.file_path)
+        rotated_path = f"{root}.{self._rotation + 1}{ext}"
+        self._fp.close()
+        os.replace(self.file_path, rotated_path)
+        self._rotation += 1
+        self._fp = self._open('w')
+        try:
+            self._compress(rotated_path, rotated_path + '.gz')
+        except Exception as e:
+            sys.stderr.write(f"压缩日志文件失败, 保留未压缩的文件 {rotated_path}: {e}\n")
+            try:
+                os.remove(rotated_path + '.gz')
+            except OSError:
+                pass
+        self._cleanup_old_logs()
+
+    @staticmethod
+    def _compress(source_path, archive_path):
+        with open(source_path, 'rb') as source, gzip.open(archive_path, 'wb') as archive:
+            shutil.copyfileobj(source, archive, 1024 * 1024)
+        os.remove(source_path)
+
+    def _cleanup_old_logs(self):
+        log_dir = os.path.dirname(self.file_path) or '.'
+        now = time.time()
+        try:
+            names = os.listdir(log_dir)
+        except OSError:
+            return
+        archives = []
+        for name in names:
+            path = os.path.join(log_dir, name)
+            try:
+                if name.endswith(('.log', '.jsonl')) and path != self.file_path:
+                    if now - os.path.getmtime(path) > self.STALE_LOG_SECONDS:
+                        self._compress(path, path + '.gz')
+                        archives.append((os.path.getmtime(path + '.gz'), path + '.gz'))
+                elif name.endswith(('.log.gz', '.jsonl.gz')):
+                    archives.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        archives.sort(reverse=True)
+        for index, (mtime, path) in enumerate(archives):
+            if index >= self.backup_count or now - mtime > self.max_age_days * 86400:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
 ##############################################
 #################工具函数区结束################
 ##############################################
 
 
 
+########################################
+############ ZIP流式写入引擎区 ############
+########################################
+
+ZIP_PARALLEL_BLOCK_SIZE = 4 * 1024 * 1024   # 并行压缩时每个数据块的大小
+DEFLATE_WINDOW_SIZE = 32 * 1024             # deflate 回溯窗口大小, 分块压缩时用上一块末尾作为预设字典
+
+def deflate_block(data, level, zdict=None, last=True):
+    """
+    独立压缩一个数据块(raw deflate), 在线程池中执行(zlib 压缩时会释放 GIL)
+    非最后一块以 Z_SYNC_FLUSH 结束(字节对齐且不置 BFINAL), 各块按顺序拼接即为合法的 deflate 流
+    """
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class ZipMemberEncoder:
+    """
+    ZIP成员编码器(仅存储), 描述一个成员的头部信息并负责把原始数据块转换为写入ZIP的数据
+    子类重写 submit 等方法实现压缩/加密
+    """
+    compress_type = zipfile.ZIP_STORED
+
+    def __init__(self, arcname, file_size, date_time, external_attr=0):
+        self.arcname = arcname
+        self.file_size = file_size
+        self.date_time = date_time
+        self.external_attr = external_attr
+
+    def header_fields(self):
+        """返回写入头部的 (压缩方法, 通用标志位, 附加字段)"""
+        return self.compress_type, 0, b''
+
+    def prefix(self):
+        """紧跟本地文件头写入的数据"""
+        return b''
+
+    def submit(self, executor, data, last):
+        """提交一个数据块, 返回结果为编码后数据的 Future"""
+        future = concurrent.futures.Future()
+        future.set_result(data)
+        return future
+
+    def consume(self, data):
+        """按顺序处理编码后的数据块(写入前调用)"""
+        pass
+
+    def suffix(self):
+        """成员数据末尾追加的数据"""
+        return b''
+
+    def header_crc(self, crc):
+        """写入头部的 CRC 值"""
+        return crc
+
+class DeflateMemberEncoder(ZipMemberEncoder):
+    """deflate 压缩的ZIP成员, 大文件被切分为独立压缩的数据块并行处理"""
+    compress_type = zipfile.ZIP_DEFLATED
+
+    def __init__(self, arcname, file_size, date_time, external_attr=0, compresslevel=6):
+        super().__init__(arcname, file_size, date_time, external_attr)
+        self.compresslevel = compresslevel
+        self._window = None  # 上一块末尾的数据, 作为下一块的预设字典以保持压缩率
+
+    def submit(self, executor, data, last):
+        future = executor.submit(deflate_block, data, self.compresslevel, self._window, last)
+        self._window = data[-DEFLATE_WINDOW_SIZE:]
+        return future
+
+WZ_AES_EXTRA_ID = 0x9901       # WinZip-AES 附加字段ID
+WZ_AES_COMPRESS_TYPE = 99      # WinZip-AES 加密成员在头部中使用的压缩方法
+WZ_AES_STRENGTH = 3            # AES-256
+WZ_AES_KEY_LENGTH = 32
+WZ_AES_SALT_LENGTH = 16
+WZ_AES_HMAC_SIZE = 10
+
+def aes_ctr_block(key, data, initial_counter):
+    """在线程池中对一个数据块做 AES-CTR 加密(WinZip-AES 使用从1开始的小端计数器), 块之间互不依赖"""
+    counter = Counter.new(nbits=128, initial_value=initial_counter, little_endian=True)
+    return AES.new(key, AES.MODE_CTR, counter=counter).encrypt(data)
+
+class AESMemberEncoder(ZipMemberEncoder):
+    """
+    WinZip-AES(AES-256)加密的ZIP成员, 与 pyzipper 的输出格式一致, 仅存储不压缩
+    每个数据块按其在成员中的偏移量确定CTR计数器起点, 因此可在线程池中并行加密;
+    HMAC 基于密文按顺序计算, 在主线程写入前完成
+    """
+    def __init__(self, arcname, file_size, date_time, password, external_attr=0):
+        super().__init__(arcname, file_size, date_time, external_attr)
+        self.salt = os.urandom(WZ_AES_SALT_LENGTH)
+        keymaterial = hashlib.pbkdf2_hmac('sha1', password, self.salt, 1000, 2 * WZ_AES_KEY_LENGTH + 2)
+        self.key = keymaterial[:WZ_AES_KEY_LENGTH]
+        self.hmac = hmac.new(keymaterial[WZ_AES_KEY_LENGTH:2 * WZ_AES_KEY_LENGTH], digestmod=hashlib.sha1)
+        self.pwd_verify = keymaterial[2 * WZ_AES_KEY_LENGTH:]
+        # AE-2 不写入CRC, 避免小文件的内容通过CRC泄露
+        self.aes_version = 2 if file_size < 20 else 1
+        self._offset = 0
+
+    def header_fields(self):
+        extra = struct.pack('<3H2sBH', WZ_AES_EXTRA_ID, 7, self.aes_version, b'AE',
+                            WZ_AES_STRENGTH, self.compress_type)
+        return WZ_AES_COMPRESS_TYPE, 0x1, extra  # 标志位 bit0: 已加密
+
+    def prefix(self):
+        return self.salt + self.pwd_verify
+
+    def submit(self, executor, data, last):
+        future = executor.submit(aes_ctr_block, self.key, data, 1 + self._offset // 16)
+        self._offset += len(data)  # 除最后一块外, 块大小均为16字节的整数倍
+        return future
+
+    def consume(self, data):
+        self.hmac.update(data)
+
+    def suffix(self):
+        return self.hmac.digest()[:WZ_AES_HMAC_SIZE]
+
+    def header_crc(self, crc):
+        return 0 if self.aes_version == 2 else crc
+
+class ZipStreamWriter:
+    """
+    精简的ZIP写入器: 从可定位文件对象的当前位置开始写入, 成员数据由调用方按顺序提供(已压缩/已加密)
+    偏移量与 zipfile 传入文件对象时一致, 以 fp.tell() 为准; 需要时自动使用 ZIP64 扩展
+    """
+    def __init__(self, fp):
+        self.fp = fp
+        self.entries = []
+        self._current = None
+
+    @staticmethod
+    def _dos_date_time(date_time):
+        dosdate = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+        dostime = date_time[3] << 11 | date_time[4] << 5 | (date_time[5] // 2)
+        return dosdate, dostime
+
+    def _local_header(self, entry):
+        extra = entry['extra']
+        if entry['zip64']:
+            extra = struct.pack('<HHQQ', 1, 16, entry['file_size'], entry['compress_size']) + extra
+            file_size = compress_size = 0xFFFFFFFF
+            extract_version = 45
+        else:
+            file_size = entry['file_size']
+            compress_size = entry['compress_size']
+            extract_version = 20
+        dosdate, dostime = self._dos_date_time(entry['date_time'])
+        header = struct.pack('<4s2B4HL2L2H', b'PK\x03\x04', extract_version, 0,
+                             entry['flag_bits'], entry['compress_type'], dostime, dosdate,
+                             entry['crc'], compress_size, file_size,
+                             len(entry['filename']), len(extra))
+        return header + entry['filename'] + extra
+
+    def begin_member(self, arcname, date_time, compress_type, file_size, flag_bits=0, extra=b'', external_attr=0):
+        """写入本地文件头(CRC和大小稍后回填)"""
+        try:
+            filename = arcname.replace(os.sep, '/').encode('ascii')
+        except UnicodeEncodeError:
+            filename = arcname.replace(os.sep, '/').encode('utf-8')
+            flag_bits |= 0x800  # 文件名使用UTF-8编码
+        entry = {
+            'filename': filename,
+            'date_time': date_time,
+            'compress_type': compress_type,
+            'flag_bits': flag_bits,
+            'extra': extra,
+            'external_attr': external_attr,
+            'file_size': file_size,
+            'compress_size': 0,
+            'crc': 0,
+            'zip64': file_size * 1.05 > zipfile.ZIP64_LIMIT,  # 与 zipfile 相同的判断方式, 压缩后可能比原始数据略大
+            'header_offset': self.fp.tell(),
+        }
+        self.fp.write(self._local_header(entry))
+        entry['data_offset'] = self.fp.tell()
+        self._current = entry
+
+    def write(self, data):
+        self.fp.write(data)
+
+    def end_member(self, crc):
+        """成员数据写完后回填本地文件头中的CRC和大小"""
+        entry = self._current
+        end_pos = self.fp.tell()
+        entry['crc'] = crc
+        entry['compress_size'] = end_pos - entry['data_offset']
+        if not entry['zip64'] and entry['compress_size'] > zipfile.ZIP64_LIMIT:
+            raise RuntimeError(f"成员 {entry['filename']!r} 压缩后超过ZIP64阈值")
+        self.fp.seek(entry['header_offset'])
+        self.fp.write(self._local_header(entry))
+        self.fp.seek(end_pos)
+        self.entries.append(entry)
+        self._current = None
+
+    def close(self, comment=b''):
+        """写入中央目录和目录结束记录"""
+        create_system = 0 if sys.platform == 'win32' else 3
+        cd_offset = self.fp.tell()
+        for entry in self.entries:
+            zip64_fields = []
+            file_size = entry['file_size']
+            compress_size = entry['compress_size']
+            header_offset = entry['header_offset']
+            if file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT:
+                zip64_fields += [file_size, compress_size]
+                file_size = compress_size = 0xFFFFFFFF
+            if header_offset > zipfile.ZIP64_LIMIT:
+                zip64_fields.append(header_offset)
+                header_offset = 0xFFFFFFFF
+            extra = entry['extra']
+            version = 20
+            if zip64_fields:
+                extra = struct.pack(f'<HH{len(zip64_fields)}Q', 1, 8 * len(zip64_fields), *zip64_fields) + extra
+                version = 45
+            dosdate, dostime = self._dos_date_time(entry['date_time'])
+            centdir = struct.pack('<4s4B4HL2L5H2L', b'PK\x01\x02', version, create_system, version, 0,
+                                  entry['flag_bits'], entry['compress_type'], dostime, dosdate,
+                                  entry['crc'], compress_size, file_size,
+                                  len(entry['filename']), len(extra), 0, 0, 0,
+                                  entry['external_attr'], header_offset)
+            self.fp.write(centdir + entry['filename'] + extra)
+
+        cd_end = self.fp.tell()
+        count = len(self.entries)
+        cd_size = cd_end - cd_offset
+        if count > 0xFFFF or cd_size > zipfile.ZIP64_LIMIT or cd_offset > zipfile.ZIP64_LIMIT:
+            # ZIP64 目录结束记录及其定位器
+            self.fp.write(struct.pack('<4sQ2H2L4Q', b'PK\x06\x06', 44, 45, 45, 0, 0,
+                                      count, count, cd_size, cd_offset))
+            self.fp.write(struct.pack('<4sLQL', b'PK\x06\x07', 0, cd_end, 1))
+            count = min(count, 0xFFFF)
+            cd_size = min(cd_size, 0xFFFFFFFF)
+            cd_offset = min(cd_offset, 0xFFFFFFFF)
+        comment = comment[:0xFFFF]
+        self.fp.write(struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, count, count, cd_size, cd_offset, len(comment)))
+        self.fp.write(comment)
+        self.fp.flush()
+
+class ZipOffsetWriter:
+    """
+    包装已打开的输出文件, 以包装时的位置作为起点对外报告 tell()/seek() 位置,
+    使写入的ZIP内部偏移量以ZIP开头为基准(ZIP嵌入在其他容器内部时使用)
+    """
+    def __init__(self, fp):
+        self.fp = fp
+        self.base = fp.tell()
+
+    def write(self, data):
+        return self.fp.write(data)
+
+    def tell(self):
+        return self.fp.tell() - self.base
+
+    def seek(self, pos, whence=0):
+        if whence == 0:
+            pos += self.base
+        return self.fp.seek(pos, whence) - self.base
+
+    def flush(self):
+        self.fp.flush()
+
+class MkvAttachmentChunkWriter:
+    """
+    把ZIP依次写入多个MKV附件(AttachedFile元素), 每个附件数据不超过 chunk_size, 用于突破单个附件约2GB的限制
+    对外报告连续的 tell()/seek() 位置(以ZIP开头为0), 可以回到已写入的位置覆盖(ZIP写完成员数据后回填本地文件头)
+    numbered 为 True 时附件依次命名为 name.001, name.002...; 否则第一个附件命名为 name, 需要分块时之后的附件从 name.002 开始编号
+    写完后调用 finish() 回填各附件的大小
+    """
+    def __init__(self, fp, name, chunk_size=None, numbered=False):
+        self.fp = fp
+        self.name = name
+        self.chunk_size = chunk_size or MKV_ATTACHMENT_CHUNK_SIZE
+        self.numbered = numbered
+        self.chunks = []  # 每项为 {'offset': AttachedFile元素位置, 'data_offset': 附件数据位置, 'size': 已写入大小}
+        self.end_offset = fp.tell()
+        self.pos = 0
+
+    def _start_chunk(self):
+        number = len(self.chunks) + 1
+        name = f"{self.name}.{number:03d}" if self.numbered or number > 1 else self.name
+        self.fp.seek(self.end_offset)
+        offset = self.end_offset
+        self.fp.write(encode_ebml_element_header(MKV_ATTACHED_FILE_ID, 0))
+        self.fp.write(encode_ebml_element(MKV_FILE_NAME_ID, name.encode('utf-8')))
+        self.fp.write(encode_ebml_element(MKV_FILE_MIME_TYPE_ID, b'application/zip' if number == 1 else b'application/octet-stream'))
+        self.fp.write(encode_ebml_element(MKV_FILE_UID_ID, (random.getrandbits(64) or 1).to_bytes(8, 'big')))
+        self.fp.write(encode_ebml_element_header(MKV_FILE_DATA_ID, 0))
+        self.end_offset = self.fp.tell()
+        self.chunks.append({'offset': offset, 'data_offset': self.end_offset, 'size': 0})
+
+    def write(self, data):
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            index, chunk_pos = divmod(self.pos, self.chunk_size)
+            if index == len(self.chunks):
+                self._start_chunk()
+            chunk = self.chunks[index]
+            size = min(len(view) - written, self.chunk_size - chunk_pos)
+            target = chunk['data_offset'] + chunk_pos
+            if self.fp.tell() != target:
+                self.fp.seek(target)
+            self.fp.write(view[written:written + size])
+            written += size
+            self.pos += size
+            if chunk_pos + size > chunk['size']:
+                chunk['size'] = chunk_pos + size
+                self.end_offset = chunk['data_offset'] + chunk['size']
+        return written
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += sum(chunk['size'] for chunk in self.chunks)
+        self.pos = pos
+        return self.pos
+
+    def flush(self):
+        self.fp.flush()
+
+    def finish(self):
+        """回填各附件(AttachedFile 和 FileData)的大小, 文件位置移到最后一个附件之后"""
+        data_header_size = len(encode_ebml_element_header(MKV_FILE_DATA_ID, 0))
+        file_header_size = len(encode_ebml_element_header(MKV_ATTACHED_FILE_ID, 0))
+        for chunk in self.chunks:
+            chunk_end = chunk['data_offset'] + chunk['size']
+            self.fp.seek(chunk['offset'])
+            self.fp.write(encode_ebml_element_header(MKV_ATTACHED_FILE_ID, chunk_end - chunk['offset'] - file_header_size))
+            self.fp.seek(chunk['data_offset'] - data_header_size)
+            self.fp.write(encode_ebml_element_header(MKV_FILE_DATA_ID, chunk['size']))
+        self.fp.seek(self.end_offset)
+
+##############################################
+##############ZIP流式写入引擎区结束#############
+##############################################
+
+
+
+########################################
+########### ZIP读取与密码校验区 ###########
+########################################
+
+WZ_AES_KEY_LENGTHS = {1: 16, 2: 24, 3: 32}   # WinZip-AES 加密强度 -> 密钥长度(盐值长度为密钥长度的一半)
+PASSWORD_CHECK_BATCH_SIZE = 64                # 并行校验时每个任务处理的密码数
+
+def make_crc32_table():
+    """CRC-32(多项式 0xEDB88320)的逐字节查找表, 供 ZipCrypto 更新密钥使用"""
+    table = []
+    for n in range(256):
+        crc = n
+        for _ in range(8):
+            crc = (crc >> 1) ^ (0xEDB88320 if crc & 1 else 0)
+        table.append(crc)
+    return table
+
+ZIP_CRC32_TABLE = make_crc32_table()
+
+def read_zip_password_check(zip_file):
+    """
+    读取ZIP中第一个加密成员的密码校验数据(只读取其本地文件头之后的十几个字节)
+    返回 ('aes', (盐值, 2字节校验值, 密钥长度)) 或 ('zipcrypto', (12字节加密头, 校验字节)); 没有加密成员时返回 None
+    zip_file 为已打开的 zipfile.ZipFile 或 pyzipper.AESZipFile
+    """
+    for zinfo in zip_file.infolist():
+        if not zinfo.flag_bits & 0x1:
+            continue
+        fp = zip_file.fp
+        fp.seek(zinfo.header_offset)
+        header = fp.read(30)
+        if len(header) < 30 or header[:4] != b'PK\x03\x04':
+            raise zipfile.BadZipFile(f"成员 {zinfo.filename} 的本地文件头无效")
+        name_length, extra_length = struct.unpack('<2H', header[26:30])
+        fp.seek(zinfo.header_offset + 30 + name_length + extra_length)
+
+        # 附加字段 0x9901: 版本(2) 'AE'(2) 强度(1) 实际压缩方法(2)
+        # 不能只看压缩方法: pyzipper 读取时会把 compress_type 改为实际压缩方法
+        extra = zinfo.extra
+        strength = None
+        while len(extra) >= 4:
+            field_id, field_length = struct.unpack('<2H', extra[:4])
+            if field_id == WZ_AES_EXTRA_ID and field_length >= 7:
+                strength = extra[8]
+                break
+            extra = extra[4 + field_length:]
+
+        if strength is not None or zinfo.compress_type == WZ_AES_COMPRESS_TYPE:
+            if strength not in WZ_AES_KEY_LENGTHS:
+                raise zipfile.BadZipFile(f"成员 {zinfo.filename} 缺少有效的 WinZip-AES 附加字段")
+            key_length = WZ_AES_KEY_LENGTHS[strength]
+            data = fp.read(key_length // 2 + 2)
+            return 'aes', (data[:key_length // 2], data[key_length // 2:], key_length)
+
+        # ZipCrypto: 加密头最后一个字节等于CRC的最高字节(使用数据描述符时为DOS修改时间的高字节)
+        if zinfo.flag_bits & 0x8:
+            hour, minute, second = zinfo.date_time[3:]
+            check_byte = ((hour << 11 | minute << 5 | second // 2) >> 8) & 0xFF
+        else:
+            check_byte = (zinfo.CRC >> 24) & 0xFF
+        return 'zipcrypto', (fp.read(12), check_byte)
+    return None
+
+def zipcrypto_decrypt_header(password, encryption_header):
+    """用密码(bytes)初始化传统ZIP加密(ZipCrypto)的三个密钥并解密12字节加密头, 按 APPNOTE 6.1 实现, 不依赖 zipfile 的私有类"""
+    keys = [0x12345678, 0x23456789, 0x34567890]
+
+    def update_keys(byte):
+        keys[0] = (keys[0] >> 8) ^ ZIP_CRC32_TABLE[(keys[0] ^ byte) & 0xFF]
+        keys[1] = ((keys[1] + (keys[0] & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        keys[2] = (keys[2] >> 8) ^ ZIP_CRC32_TABLE[(keys[2] ^ (keys[1] >> 24)) & 0xFF]
+
+    for byte in password:
+        update_keys(byte)
+    header = bytearray()
+    for byte in encryption_header:
+        temp = keys[2] | 2
+        header.append(byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF))
+        update_keys(header[-1])
+    return bytes(header)
+
+def check_zip_password(password_check, password):
+    """用 read_zip_password_check 的结果校验单个密码, 通过校验不代表密码一定正确(AES约1/65536, ZipCrypto约1/256的误判)"""
+    kind, data = password_check
+    pwd = password.encode('utf-8')
+    if kind == 'aes':
+        salt, verifier, key_length = data
+        return hashlib.pbkdf2_hmac('sha1', pwd, salt, 1000, 2 * key_length + 2)[-2:] == verifier
+    encryption_header, check_byte = data
+    return zipcrypto_decrypt_header(pwd, encryption_header)[11] == check_byte
+
+def iter_zip_passwords(password_check, password_list, workers=None):
+    """
+    解压前筛选密码列表: 按原顺序逐个产出能通过 password_check(见 read_zip_password_check)校验的密码, 没有加密成员时只产出空密码
+    WinZip-AES 每个密码只需一次 PBKDF2, 在线程池中分批并行计算(hashlib 计算时会释放 GIL), 调用方拿到第一个密码时后续批次仍在后台校验;
+    调用方找到正确密码后停止迭代即可, 尚未开始的批次会被取消. ZipCrypto 每个密码只需解密12字节, 直接顺序校验
+    """
+    if password_check is None:
+        yield ''  # 未加密的ZIP任何密码都能解开, 统一用空密码, 以免被误记为命中
+        return
+    candidates = [password for password in password_list if password]  # 加密成员不可能用空密码解开
+
+    def check_batch(batch):
+        return [password for password in batch if check_zip_password(password_check, password)]
+
+    workers = workers or os.cpu_count() or 1
+    if password_check[0] != 'aes' or workers == 1 or len(candidates) <= PASSWORD_CHECK_BATCH_SIZE:
+        for password in candidates:
+            if check_zip_password(password_check, password):
+                yield password
+        return
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(check_batch, candidates[i:i + PASSWORD_CHECK_BATCH_SIZE])
+                   for i in range(0, len(candidates), PASSWORD_CHECK_BATCH_SIZE)]
+        for future in futures:
+            yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+class FileWindow(io.RawIOBase):
+    """
+    只读的文件区间视图: 把文件的 [start, end) 区间当作一个独立的可定位文件, tell()/seek() 以区间开头为0
+    用于在隐写文件中直接打开嵌入的ZIP(free原子内部), 不需要把数据读入内存或写到临时文件
+    ranges 为 [(start, end), ...] 时按顺序把多个区间拼接成一个连续的视图(MKV分块附件)
+    """
+    def __init__(self, file_path, start=None, end=None, ranges=None):
+        super().__init__()
+        self._ranges = list(ranges) if ranges is not None else [(start, end)]
+        self._range_offsets = []  # 各区间在视图中的起始位置
+        self.size = 0
+        for range_start, range_end in self._ranges:
+            self._range_offsets.append(self.size)
+            self.size += range_end - range_start
+        self._fp = open(file_path, 'rb')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return self._pos
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        total = 0
+        # 跨越区间边界时继续读取下一个区间, 保证除文件末尾外总是读满(zipfile 按读取长度判断数据是否完整)
+        while total < len(view) and self._pos < self.size:
+            index = bisect.bisect_right(self._range_offsets, self._pos) - 1
+            range_start, range_end = self._ranges[index]
+            offset = range_start + self._pos - self._range_offsets[index]
+            size = min(len(view) - total, range_end - offset)
+            self._fp.seek(offset)
+            read = self._fp.readinto(view[total:total + size])
+            if not read:
+                break
+            total += read
+            self._pos += read
+        return total
+
+    def close(self):
+        if not self.closed:
+            self._fp.close()
+        super().close()
+
+class ZipArchiveIndex:
+    """
+    隐写文件中ZIP的中央目录索引: 每个容器只解析一次中央目录, 之后所有密码尝试和解压流程都复用这一份索引
+    使用 pyzipper.AESZipFile 打开(同时支持未加密、ZipCrypto 和 WinZip-AES 成员), 密码在读取成员时通过 pwd 参数传入, 不修改共享状态
+    members 为精简的成员列表, 每项包含 name/clean_name/is_dir/file_size/compress_size/encrypted
+    """
+    def __init__(self, source):
+        self.zip_file = pyzipper.AESZipFile(source, 'r')
+        self.members = []
+        for zinfo in self.zip_file.infolist():
+            self.members.append({
+                'name': zinfo.filename,
+                'clean_name': sanitize_path(zinfo.filename),  # 过滤掉不安全的路径
+                'is_dir': zinfo.filename.endswith('/'),
+                'file_size': zinfo.file_size,
+                'compress_size': zinfo.compress_size,
+                'encrypted': bool(zinfo.flag_bits & 0x1),
+            })
+        self.total_size = sum(member['file_size'] for member in self.members)
+
+    @property
+    def comment(self):
+        return self.zip_file.comment
+
+    def open(self, member, password_bytes=None):
+        return self.zip_file.open(member['name'], pwd=password_bytes)
+
+    def close(self):
+        self.zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+##############################################
+###########ZIP读取与密码校验区结束############
+##############################################
+
+
+
+########################################
+############## 批量处理区 ##############
+########################################
+
+def collect_batch_hide_tasks(paths=None, manifest=None):
+    """
+    收集批量隐写的输入, 返回 [{'input': 输入路径, 'output': 输出路径或None}, ...]
+    paths 中的每一项可以是路径或通配符; manifest 为清单文件, 每行一个输入路径, 可用制表符分隔指定输出路径, # 开头的行为注释
+    """
+    tasks = []
+    for pattern in paths or []:
+        pattern = pattern.strip().strip('"').strip("'")
+        if not pattern:
+            continue
+        matches = natsorted(glob.glob(pattern), alg=ns.PATH)
+        if not matches and os.path.exists(pattern):
+            matches = [pattern]  # 文件名中含有 [ ] 等通配符字符时按原样使用
+        if not matches:
+            print(f"警告：路径不存在或无效: {pattern}")
+        tasks.extend({'input': match, 'output': None} for match in matches)
+
+    if manifest:
+        with open(manifest, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = [part.strip().strip('"') for part in line.split('\t')]
+                tasks.append({'input': parts[0], 'output': parts[1] if len(parts) > 1 and parts[1] else None})
+
+    # 同一输入(通配符重叠或清单重复)只保留第一次出现的任务
+    unique_tasks, seen = [], set()
+    for task in tasks:
+        key = os.path.normcase(os.path.abspath(task['input']).rstrip('\\/'))
+        if key in seen:
+            print(f"警告：重复的输入已忽略: {task['input']}")
+            continue
+        seen.add(key)
+        unique_tasks.append(task)
+    return unique_tasks
+
+class BatchHideEngine:
+    """
+    批量隐写引擎: 多个输入在有上限的线程池中并行隐写
+    压缩(CPU密集)和外壳复制(磁盘密集)分别用信号量限制同时进行的任务数, 可选按输入大小从小到大执行(短作业优先)
+    每个任务使用 Steganographier 的浅拷贝; 外壳文件在开始前按输入顺序预先选好, 因此选择结果与逐个执行时一致
+    """
+    def __init__(self, steganographier, jobs=None, copy_jobs=None, compress_jobs=None, shortest_first=False):
+        cpu_count = os.cpu_count() or 1
+        self.steganographier = steganographier
+        self.jobs = max(1, jobs or cpu_count)
+        self.copy_jobs = max(1, copy_jobs or min(self.jobs, 2))
+        self.compress_jobs = max(1, compress_jobs or min(self.jobs, cpu_count))
+        self.shortest_first = shortest_first
+        self.on_job_done = None  # 回调: on_job_done(已完成任务数, 任务总数, 任务结果)
+
+    def run(self, tasks, password=None, type_option_var='mp4', output_option=None,
+            output_cover_video_name_mode=None, video_folder_path=None):
+        """
+        执行批量隐写, tasks 为 [{'input': 输入路径, 'output': 输出路径或None, 'cover': 外壳路径或None}, ...]
+        返回与 tasks 顺序一致的结果列表, 每项包含 input/output/cover/size/status('ok'|'failed')/error/elapsed
+        """
+        stego = self.steganographier
+        results = []
+        for index, task in enumerate(tasks):
+            result = {
+                'index': index,
+                'input': task['input'],
+                'output': task.get('output'),
+                'cover': task.get('cover'),
+                'size': 0,
+                'status': 'pending',
+                'error': None,
+                'elapsed': 0.0,
+            }
+            try:
+                if not os.path.exists(task['input']):
+                    raise FileNotFoundError(f"输入路径不存在: {task['input']}")
+                result['size'] = get_file_or_folder_size(task['input'])
+                # 按提交顺序预先选择外壳文件(随机模式和顺序模式都依赖选择的先后顺序)
+                if not result['cover']:
+                    result['cover'] = stego.choose_cover_video_file(processed_files=index,
+                                                                    output_cover_video_name_mode=output_cover_video_name_mode,
+                                                                    video_folder_path=video_folder_path)
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+            results.append(result)
+
+        pending = [result for result in results if result['status'] == 'pending']
+        if self.shortest_first:
+            pending.sort(key=lambda result: result['size'])  # 短作业优先, 大小相同时保持输入顺序
+
+        copy_semaphore = threading.BoundedSemaphore(self.copy_jobs)
+        compress_semaphore = threading.BoundedSemaphore(self.compress_jobs)
+        # 同时压缩的任务平分CPU核心
+        compress_workers = stego.compress_workers or max(1, (os.cpu_count() or 1) // self.compress_jobs)
+        done_count = len(results) - len(pending)
+        done_lock = threading.Lock()
+
+        def run_job(result):
+            worker = copy.copy(stego)
+            worker.copy_semaphore = copy_semaphore
+            worker.compress_semaphore = compress_semaphore
+            worker.compress_workers = compress_workers
+            if self.jobs > 1:
+                worker.progress_callback = None  # 并行时单个任务的字节进度没有意义, 改为按完成的任务数报告
+            start_time = time.time()
+            try:
+                result['output'] = worker.hide_file(input_file_path=result['input'],
+                                                    cover_video_CLI=result['cover'],
+                                                    password=password,
+                                                    processed_files=result['index'],
+                                                    output_file_path=result['output'],
+                                                    output_option=output_option,
+                                                    output_cover_video_name_mode=output_cover_video_name_mode,
+                                                    type_option_var=type_option_var,
+                                                    video_folder_path=video_folder_path)
+                result['status'] = 'ok'
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+                stego.log(f"隐写失败: {result['input']} - {e}")
+            finally:
+                result['elapsed'] = time.time() - start_time
+                stego.log(f"隐写任务结束: {result['input']} ({result['status']})", job=result['index'], stage='hide',
+                          bytes=result['size'], duration=round(result['elapsed'], 3))
+            return result
+
+        stego.log(f"批量隐写: {len(pending)} 个任务, 并行任务数 {self.jobs}, "
+                  f"复制并发 {self.copy_jobs}, 压缩并发 {self.compress_jobs}, 每个任务压缩线程 {compress_workers}"
+                  + (", 短作业优先" if self.shortest_first else ""))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(run_job, result) for result in pending]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                with done_lock:
+                    done_count += 1
+                    if self.on_job_done:
+                        self.on_job_done(done_count, len(results), result)
+
+        return results
+
+    @staticmethod
+    def summary_lines(results):
+        """生成每个任务的汇总信息"""
+        lines = ["========== 批量隐写汇总 =========="]
+        for result in results:
+            if result['status'] == 'ok':
+                lines.append(f"[{result['index'] + 1}] 成功 {format_size(result['size'])} "
+                             f"{result['elapsed']:.1f}s: {result['input']} -> {result['output']} (外壳: {os.path.basename(result['cover'])})")
+            else:
+                lines.append(f"[{result['index'] + 1}] 失败: {result['input']} - {result['error']}")
+        success_count = sum(1 for result in results if result['status'] == 'ok')
+        total_size = sum(result['size'] for result in results if result['status'] == 'ok')
+        lines.append(f"共 {len(results)} 个任务, 成功 {success_count} 个, 失败 {len(results) - success_count} 个, "
+                     f"成功隐写 {format_size(total_size)}")
+        return lines
+
+REVEAL_VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.m4v', '.webm')  # 批量解除隐写时扫描的视频格式
+
+def collect_hidden_video_files(root_dir):
+    """扫描目录下所有视频文件作为批量解除隐写的输入, 按路径自然排序, 使处理顺序(以及同名冲突的处理结果)固定"""
+    video_files = []
+    for root, dirs, files in os.walk(root_dir):
+        for file in files:
+            if file.lower().endswith(REVEAL_VIDEO_EXTENSIONS):
+                video_files.append(os.path.join(root, file))
+    return natsorted(video_files, alg=ns.PATH)
+
+class BatchRevealEngine:
+    """
+    批量解除隐写引擎: 多个隐写文件在有上限的线程池中并行解除
+    同一磁盘(按 st_dev 区分)上同时进行的任务数另用信号量限制, 避免机械硬盘上多个任务互相抢占磁头
+    每个任务先解压到输出文件夹下的独立暂存文件夹, 再按输入顺序逐个移入输出文件夹, 因此同名冲突的处理结果与逐个执行时一致
+    """
+    def __init__(self, steganographier, jobs=None, per_device_jobs=None):
+        self.steganographier = steganographier
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.per_device_jobs = max(1, per_device_jobs or min(self.jobs, 2))
+        self.on_job_done = None  # 回调: on_job_done(已完成任务数, 任务总数, 任务结果)
+        self.cancel_event = threading.Event()
+        self._device_semaphores = {}
+        self._device_lock = threading.Lock()
+
+    def cancel(self):
+        """取消尚未开始的任务, 已开始的任务会执行完毕"""
+        self.cancel_event.set()
+
+    def _device_semaphore(self, path):
+        """返回 path 所在磁盘的并发信号量"""
+        try:
+            device = os.stat(path).st_dev
+        except OSError:
+            device = None
+        with self._device_lock:
+            if device not in self._device_semaphores:
+                self._device_semaphores[device] = threading.BoundedSemaphore(self.per_device_jobs)
+            return self._device_semaphores[device]
+
+    def run(self, files, password=None, type_option_var=None, delete_original=True, auto_rename_on_conflict=None):
+        """
+        执行批量解除隐写, files 为隐写文件路径列表, 解压到各自所在的文件夹
+        返回与 files 顺序一致的结果列表, 每项包含 input/output_dir/size/status('ok'|'failed'|'cancelled')/error/elapsed
+        """
+        stego = self.steganographier
+        if auto_rename_on_conflict is not None:
+            stego.auto_rename_on_conflict = auto_rename_on_conflict
+
+        results = []
+        for index, file_path in enumerate(files):
+            result = {
+                'index': index,
+                'input': file_path,
+                'output_dir': os.path.dirname(file_path) or '.',
+                'size': 0,
+                'status': 'pending',
+                'error': None,
+                'elapsed': 0.0,
+            }
+            try:
+                result['size'] = os.path.getsize(file_path)
+            except OSError as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+            results.append(result)
+
+        # 并行任务平分CPU核心用于密码预校验, 避免每个任务都开启CPU核心数个线程
+        password_check_workers = stego.password_check_workers or max(1, (os.cpu_count() or 1) // self.jobs)
+
+        def run_job(result):
+            if self.cancel_event.is_set():
+                result['status'] = 'cancelled'
+                return result
+            with self._device_semaphore(result['output_dir']):
+                if self.cancel_event.is_set():
+                    result['status'] = 'cancelled'
+                    return result
+                worker = copy.copy(stego)
+                worker.password_check_workers = password_check_workers
+                if self.jobs > 1:
+                    worker.progress_callback = None  # 并行时单个任务的字节进度没有意义, 改为按完成的任务数报告
+                start_time = time.time()
+                try:
+                    result['staging_dir'] = tempfile.mkdtemp(prefix='.reveal_', dir=result['output_dir'])
+                    # 原始文件在结果移入输出文件夹后再删除
+                    if worker.reveal_file(input_file_path=result['input'],
+                                          password=password,
+                                          type_option_var=type_option_var,
+                                          delete_original=False,
+                                          output_dir=result['staging_dir']):
+                        result['status'] = 'ok'
+                    else:
+                        result['status'] = 'failed'
+                        result['error'] = "所有解压方法都失败了"
+                except Exception as e:
+                    result['status'] = 'failed'
+                    result['error'] = str(e)
+                    stego.log(f"解除隐写失败: {result['input']} - {e}")
+                finally:
+                    result['elapsed'] = time.time() - start_time
+                    stego.log(f"解除隐写任务结束: {result['input']} ({result['status']})", job=result['index'], stage='reveal',
+                              bytes=result['size'], duration=round(result['elapsed'], 3))
+            return result
+
+        pending = [result for result in results if result['status'] == 'pending']
+        done_count = len(results) - len(pending)
+        stego.log(f"批量解除隐写: {len(pending)} 个文件, 并行任务数 {self.jobs}, 每个磁盘并发 {self.per_device_jobs}")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(run_job, result) for result in pending]
+            for future in futures:  # 按输入顺序移入结果
+                result = future.result()
+                self._commit(result, delete_original)
+                done_count += 1
+                if self.on_job_done:
+                    self.on_job_done(done_count, len(results), result)
+
+        return results
+
+    def _commit(self, result, delete_original):
+        """将暂存文件夹中的解压结果移入输出文件夹(同名冲突按 auto_rename_on_conflict 处理), 成功后删除原始文件"""
+        stego = self.steganographier
+        staging_dir = result.pop('staging_dir', None)
+        try:
+            if result['status'] == 'ok':
+                stego._move_extracted_files(staging_dir, result['output_dir'])
+                if delete_original:
+                    try:
+                        os.remove(result['input'])
+                        stego.log(f"原始隐写文件已删除: {result['input']}")
+                    except Exception as e:
+                        stego.log(f"删除原始文件时出错: {e}")
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = f"移动解压结果时出错: {e}"
+            stego.log(f"解除隐写失败: {result['input']} - {result['error']}")
+        finally:
+            if staging_dir:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+    @staticmethod
+    def summary_lines(results):
+        """生成每个任务的汇总信息"""
+        lines = ["========== 批量解除隐写汇总 =========="]
+        for result in results:
+            if result['status'] == 'ok':
+                lines.append(f"[{result['index'] + 1}] 成功 {format_size(result['size'])} {result['elapsed']:.1f}s: {result['input']}")
+            elif result['status'] == 'cancelled':
+                lines.append(f"[{result['index'] + 1}] 已取消: {result['input']}")
+            else:
+                lines.append(f"[{result['index'] + 1}] 失败: {result['input']} - {result['error']}")
+        success_count = sum(1 for result in results if result['status'] == 'ok')
+        failed_count = sum(1 for result in results if result['status'] == 'failed')
+        lines.append(f"共 {len(results)} 个文件, 成功 {success_count} 个, 失败 {failed_count} 个"
+                     + (f", 取消 {len(results) - success_count - failed_count} 个" if success_count + failed_count < len(results) else ""))
+        return lines
+
+##############################################
+################批量处理区结束#################
+##############################################
+
+
+
 
 
 
@@ -773,8 +2824,6 @@ class SteganographierGUI:
         self.type_option_var = tk.StringVar(value="mp4")
         self.output_cover_video_name_mode_var = tk.StringVar(value="")
         self.mkvmerge_exe           = os.path.join(application_path,'tools','mkvmerge.exe')
-        self.mkvextract_exe         = os.path.join(application_path,'tools','mkvextract.exe')
-        self.mkvinfo_exe            = os.path.join(application_path,'tools','mkvinfo.exe')
         self._7z_exe                = os.path.join(application_path,'tools','7z.exe')
         self.hash_modifier_exe      = os.path.join(application_path,'tools','hash_modifier.exe')
         self.captcha_generator_exe  = os.path.join(application_path,'tools','captcha_generator.exe')
@@ -786,6 +2835,8 @@ class SteganographierGUI:
         self.auto_clear_after_complete = False  # 执行完成后自动清空窗口的选项
         self.delete_original_after_reveal = True  # 解除隐写后默认删除原始文件
         self.auto_rename_on_conflict = False  # 解除隐写时遇到同名文件是否自动重命名
+        self.hide_jobs = 1  # 批量隐写的并行任务数(配置文件 hide_jobs), 默认逐个执行
+        self.reveal_jobs = 1  # 批量解除隐写的并行任务数(配置文件 reveal_jobs), 默认逐个执行
         self.cover_video_options = []
         
         self.hash_modifier_process = None
@@ -810,6 +2861,8 @@ class SteganographierGUI:
         self.steganographier.set_log_callback(self.log)
 
         self.create_widgets()  # GUI实现部分
+        self.progress_bus = ProgressBus(self.root, self._show_progress)  # 工作线程的进度更新由Tk主线程按帧率合并显示
+        self.progress_bus.start()
         
         # 传参：如果有传入的文件路径，自动填充到 reveal_text
         if reveal_files:
@@ -995,6 +3048,8 @@ class SteganographierGUI:
         self.log_text.insert(tk.END, "【免责声明】:\n--本程序仅用于保护个人信息安全, 请勿用于任何违法犯罪活动--\nConsole output goes here...\n\n")
         self.log_text.configure(state=tk.DISABLED, fg="grey")
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)  # 文本框设置为填充BOTH方向，并支持扩展
+        self.log_sink = GuiLogSink(self.log_text, readonly=True)  # 日志批量写入文本框, 只保留最近的行
+        self.log_sink.start()
 
         log_scrollbar_y.config(command=self.log_text.yview)  # 设置垂直滚动条与文本框的联动
         log_scrollbar_x.config(command=self.log_text.xview)  # 设置水平滚动条与文本框的联动
@@ -1114,18 +3169,13 @@ class SteganographierGUI:
             size = get_file_or_folder_size(file_path)
             print(f"Target size: {size}")
             print(f"self.type_option_var.get(): {self.type_option_var.get()}")
-            # 检查是否为 mkv 文件并且大小是否超过 2GB
-            if self.type_option_var.get() == "mkv" and size > 2 * 1024 * 1024 * 1024:
-                messagebox.showerror("文件大小错误", "mkv 文件不能隐写超过 2GB 的文件")
-                self.clear()
-                return
             # 2.1 由逻辑层传入当前正在使用的外壳MP4文件, 用来进行大小-时长检查
             cover_video_path = self.steganographier.choose_cover_video_file(
                 processed_files=idx,
                 output_cover_video_name_mode=self.output_cover_video_name_mode_var.get(),
                 video_folder_path=self.video_folder_path,
             )
-            duration_seconds = get_video_duration(cover_video_path)
+            duration_seconds = get_cover_video_info(cover_video_path)['duration_seconds']
             self.check_file_size_and_duration(file_path, duration_seconds, idx) 
             self.log(f"输入[{idx+1}]: {os.path.split(file_path)[1]}, 文件/文件夹大小 {format_size(size)}, 预定外壳时长 {format_duration(duration_seconds)}")
 
@@ -1233,6 +3283,7 @@ class SteganographierGUI:
     def update_video_folder_path(self, new_path):
         self.video_folder_path = new_path
         self.steganographier.video_folder_path = new_path  # 更新Steganographier实例的video_folder_path
+        self.steganographier.refresh_cover_video_index()
 
     # 4.a 选择外壳MP4文件夹函数
     def select_video_folder(self):
@@ -1253,7 +3304,7 @@ class SteganographierGUI:
     # 检查mkv工具是否缺失
     def check_mkvtools_existence(self):
         missing_tools = []
-        for tool in [self.mkvmerge_exe, self.mkvinfo_exe, self.mkvextract_exe]:
+        for tool in [self.mkvmerge_exe]:  # 附件提取已改为直接解析, 只有隐写时需要 mkvmerge
             if not os.path.exists(tool):
                 missing_tools.append(os.path.basename(tool))
 
@@ -1275,13 +3326,8 @@ class SteganographierGUI:
         return True
 
     def log(self, message):
-        """GUI日志记录方法, 同时显示在GUI文本框和写入日志文件"""
-        # 显示到GUI文本框
-        self.log_text.configure(state=tk.NORMAL, fg="grey")
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.configure(state=tk.DISABLED, fg="grey")
-        self.log_text.see(tk.END)
-        self.log_text.update_idletasks()
+        """GUI日志记录方法, 显示在GUI文本框(由 log_sink 在Tk主线程中批量插入, 可在工作线程中调用)"""
+        self.log_sink.write(message)
         
     def start_thread(self):
         # 在启动线程前, 先将焦点转移到主窗口上, 触发密码输入框的FocusOut事件
@@ -1293,7 +3339,7 @@ class SteganographierGUI:
         self.start_button.configure(state=tk.DISABLED)
         self.clear_button.configure(state=tk.DISABLED)
         
-        self.progress['value'] = 0 # 初始化进度条
+        self.update_progress(0, 0) # 初始化进度条
         
         # 2. 获取密码的逻辑
         def get_password():
@@ -1332,39 +3378,41 @@ class SteganographierGUI:
         
         total_files = len(hide_file_paths) + len(reveal_file_paths)
         
-        # 5. 隐写流程
-        processed_files = 0
-        for input_file_path in hide_file_paths:
-            if input_file_path:
-                # 执行隐写
-                self.steganographier.hide_file(
-                    input_file_path=input_file_path, 
-                    password=self.password,
-                    processed_files=processed_files,
-                    output_option=self.output_option_var.get(),
-                    output_cover_video_name_mode=self.output_cover_video_name_mode_var.get(),
-                    type_option_var=self.type_option_var.get(),
-                    video_folder_path=self.video_folder_path
-                )
-                processed_files += 1
-                self.update_progress(processed_files, total_files)
-
-        # 6. 解除隐写流程
-        processed_files = 0
+        # 5. 隐写流程(并行任务数由配置文件中的 hide_jobs 指定, 默认逐个执行)
+        hide_tasks = [{'input': input_file_path} for input_file_path in hide_file_paths if input_file_path]
+        if hide_tasks:
+            self.steganographier.refresh_cover_video_index()  # 每批任务开始前重新扫描一次外壳文件夹
+            engine = BatchHideEngine(self.steganographier, jobs=self.hide_jobs)
+            engine.on_job_done = lambda done, total, result: self.update_progress(done, total_files)
+            results = engine.run(hide_tasks,
+                                 password=self.password,
+                                 type_option_var=self.type_option_var.get(),
+                                 output_option=self.output_option_var.get(),
+                                 output_cover_video_name_mode=self.output_cover_video_name_mode_var.get(),
+                                 video_folder_path=self.video_folder_path)
+            if len(results) > 1 or results[0]['status'] != 'ok':
+                for line in engine.summary_lines(results):
+                    self.log(line)
+
+        # 6. 解除隐写流程(并行任务数由配置文件中的 reveal_jobs 指定, 默认逐个执行)
+        reveal_files = []
         for input_file_path in reveal_file_paths:
             if input_file_path:
                 if not os.path.exists(input_file_path):
                     self.log(f"警告：文件名不存在或含有非法字符，跳过 -> {input_file_path}")
                     continue
-                self.steganographier.reveal_file(
-                    input_file_path=input_file_path, 
-                    password=self.password, 
-                    type_option_var=self.type_option_var.get(),
-                    delete_original=delete_after_reveal,
-                    auto_rename_on_conflict=self.auto_rename_var.get()
-                )
-                processed_files += 1
-                self.update_progress(processed_files, total_files)
+                reveal_files.append(input_file_path)
+        if reveal_files:
+            engine = BatchRevealEngine(self.steganographier, jobs=self.reveal_jobs)
+            engine.on_job_done = lambda done, total, result: self.update_progress(len(hide_tasks) + done, total_files)
+            results = engine.run(reveal_files,
+                                 password=self.password,
+                                 type_option_var=self.type_option_var.get(),
+                                 delete_original=delete_after_reveal,
+                                 auto_rename_on_conflict=self.auto_rename_var.get())
+            if len(results) > 1:
+                for line in engine.summary_lines(results):
+                    self.log(line)
         
         messagebox.showinfo("Success", "所有操作已完成！")
 
@@ -1376,10 +3424,12 @@ class SteganographierGUI:
         self.start_button.configure(state=tk.NORMAL)
         self.clear_button.configure(state=tk.NORMAL)
         
-    def update_progress(self, processed_size, total_size): # 进度条回调函数, 接收逻辑层的处理进度然后显示在GUI中
-        progress = (processed_size+1) / total_size
+    def update_progress(self, processed_size, total_size): # 进度条回调函数, 接收逻辑层的处理进度(在工作线程中调用, 只提交到 progress_bus)
+        self.progress_bus.post(processed_size, total_size)
+
+    def _show_progress(self, processed_size, total_size): # 在Tk主线程中显示进度
+        progress = (processed_size+1) / total_size if total_size > 0 else 0
         self.progress['value'] = progress * 100
-        self.root.update_idletasks()
 
     def on_cover_video_duration(self, duration_seconds): # 回调函数, 用于接收来自逻辑层的外壳文件时长信息
         self.cover_video_duration = duration_seconds
@@ -1388,6 +3438,7 @@ class SteganographierGUI:
         self.hide_text.delete("1.0", tk.END)
         self.reveal_text.delete("1.0", tk.END)
         
+        self.log_sink.discard()
         self.log_text.configure(state=tk.NORMAL, fg="grey")
         self.log_text.delete("1.0", tk.END)
         self.log_text.insert(tk.END, "【免责声明】:\n--本程序仅用于保护个人信息安全, 请勿用于任何违法犯罪活动--\nConsole output goes here...\n\n")
@@ -1456,6 +3507,8 @@ class SteganographierGUI:
                 self.auto_clear_after_complete = config.get('auto_clear_after_complete', False)
                 self.delete_original_after_reveal = config.get('delete_original_after_reveal', True)
                 self.auto_rename_on_conflict = config.get('auto_rename_on_conflict', False)
+                self.hide_jobs = config.get('hide_jobs', 1)
+                self.reveal_jobs = config.get('reveal_jobs', 1)
 
     def save_config(self):
         config = {
@@ -1466,7 +3519,9 @@ class SteganographierGUI:
             'output_cover_video_name_mode': self.output_cover_video_name_mode_var.get(),
             'auto_clear_after_complete': self.auto_clear_var.get(),
             'delete_original_after_reveal': self.delete_after_reveal_var.get(),
-            'auto_rename_on_conflict': self.auto_rename_var.get()
+            'auto_rename_on_conflict': self.auto_rename_var.get(),
+            'hide_jobs': self.hide_jobs,
+            'reveal_jobs': self.reveal_jobs
         }
         with open(self.config_file, 'w') as f:
             json.dump(config, f, indent=4)
@@ -1544,27 +3599,22 @@ class SteganographierGUI:
 
 class Steganographier:
     '''隐写的具体功能由此类实现'''
-    def __init__(self, video_folder_path=None, gui_enabled=False, password_file=None, enable_log_file=False, version="1.0.0"):
+    def __init__(self, video_folder_path=None, gui_enabled=False, password_file=None, enable_log_file=False, version="1.0.0", log_json=False):
         
         # 日志文件相关
         # 首先定义 log 方法需要的基本属性
         self.gui_enabled = gui_enabled
         self.enable_log_file = enable_log_file
+        self.log_json = log_json  # 日志文件是否使用 JSON Lines 格式
         self.log_file_path = None
-        self.log_file_handle = None
+        self.log_writer = None    # 后台日志写入线程(AsyncLogWriter), GUI模式和批量处理模式的多个线程共用
         self.version = version  # 存储版本号
 
-        # 添加线程锁，用于保护日志写入, GUI模式和批量处理模式使用多线程，需要锁保护日志文件，防止乱码
-        import threading
-        self.log_lock = threading.Lock()
-
         # 如果启用日志文件，则初始化日志文件
         if self.enable_log_file:
             self.init_log_file()
         
         self.mkvmerge_exe   = os.path.join(application_path,'tools','mkvmerge.exe')
-        self.mkvextract_exe = os.path.join(application_path,'tools','mkvextract.exe')
-        self.mkvinfo_exe    = os.path.join(application_path,'tools','mkvinfo.exe')
         self._7z_exe        = os.path.join(application_path,'tools','7z.exe')
         self.password_file  = password_file or os.path.join(application_path,'modules',"PW.txt")
         self.passwords = self.load_passwords()
@@ -1576,10 +3626,20 @@ class Steganographier:
         self.log(f"外壳文件夹路径：{self.video_folder_path}")
         self.total_file_size                = None            # 被隐写文件/文件夹的总大小
         self.password                       = None            # 密码
-        self.remaining_cover_video_files    = []              # 随机选择模式时的剩余外壳文件列表
+        self.cover_video_index              = None            # 外壳视频索引(CoverVideoIndex), 按需创建
         self.progress_callback              = None            # 进度条回调参数
         self.cover_video_path               = None            # 包含完整路径的外壳文件
         self.auto_rename_on_conflict        = False           # 解除隐写时遇到同名文件是否自动重命名
+        self.compress_workers               = None            # 并行压缩线程数, None 表示使用CPU核心数
+        self.password_check_workers         = None            # 密码预校验(WinZip-AES)线程数, None 表示使用CPU核心数
+        self.copy_semaphore                 = None            # 批量隐写时限制同时复制外壳文件的任务数(BatchHideEngine 设置)
+        self.compress_semaphore             = None            # 批量隐写时限制同时压缩的任务数(BatchHideEngine 设置)
+        self._password_check_cache          = {}              # 密码预校验结果, 见 _filter_passwords
+        self._zip_index_cache               = {}              # ZIP中央目录索引, 见 _open_zip_index
+        self._reveal_file_path              = None            # 正在解除隐写的文件, 以及用于密码排序和命中统计的信息(见 reveal_file)
+        self._reveal_password               = None
+        self._reveal_contexts               = []
+        self._revealed_password             = None
 
     def init_log_file(self):
         """初始化日志文件"""
@@ -1590,24 +3650,19 @@ class Steganographier:
             
             # 生成日志文件名（带时间戳）
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            self.log_file_path = os.path.join(log_dir, f'steganographier_{timestamp}.log')
-            
-            # 打开日志文件，使用无缓冲模式
-            self.log_file_handle = open(
-                self.log_file_path, 
-                'w', 
-                encoding='utf-8-sig',  # 带BOM
-                buffering=1  # 行缓冲
-            )
+            self.log_file_path = os.path.join(log_dir, f"steganographier_{timestamp}.{'jsonl' if self.log_json else 'log'}")
+            
+            # 日志由后台线程写入, 旧日志的压缩和清理也在后台线程中进行
+            self.log_writer = AsyncLogWriter(self.log_file_path, json_lines=self.log_json)
             
-            # 使用锁保护初始写入
-            with self.log_lock:
-                # 写入日志头部信息
-                self.log_file_handle.write("="*60 + "\n")
-                self.log_file_handle.write(f"隐写者程序运行日志-版本号: {self.version}\n")
-                self.log_file_handle.write(f"开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                self.log_file_handle.write("="*60 + "\n\n")
-                self.log_file_handle.flush()
+            # 写入日志头部信息
+            if self.log_json:
+                self.log_writer.write(f"隐写者程序运行日志-版本号: {self.version}", stage='start')
+            else:
+                self.log_writer.write_raw("="*60 + "\n"
+                                          + f"隐写者程序运行日志-版本号: {self.version}\n"
+                                          + f"开始时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                          + "="*60 + "\n\n")
             
             # 使用 write_to_log_file 而不是 print
             self.write_to_log_file(f"日志文件已创建: {self.log_file_path}")
@@ -1620,14 +3675,15 @@ class Steganographier:
 
     def close_log_file(self):
         """关闭日志文件"""
-        if self.log_file_handle:
+        if self.log_writer:
             try:
-                with self.log_lock:
-                    self.log_file_handle.flush()  # 只在关闭时flush
-                    self.log_file_handle.write("\n" + "="*60 + "\n")
-                    self.log_file_handle.write(f"结束时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    self.log_file_handle.write("="*60 + "\n")
-                    self.log_file_handle.close()
+                if self.log_json:
+                    self.log_writer.write("运行结束", stage='end')
+                else:
+                    self.log_writer.write_raw("\n" + "="*60 + "\n"
+                                              + f"结束时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                                              + "="*60 + "\n")
+                self.log_writer.close()  # 等待队列中的记录写完
                 
                 import sys
                 sys.stderr.write(f"日志已保存到: {self.log_file_path}\n")
@@ -1645,6 +3701,18 @@ class Steganographier:
     def set_log_callback(self, callback):   # GUI log方法回调函数, 把GUI的self.log方法(这里用callback指代)传给逻辑层, 逻辑层再借self.log_callback把log信息传回GUI
         self.log_callback = callback
 
+    def copy_cover_data(self, cover_file, output, length, processed_size, progress_total):
+        """复制外壳文件数据(见 copy_file_data)并更新进度条, 返回 (已处理大小, 复制方式)"""
+        def report(size):
+            nonlocal processed_size
+            processed_size += size
+            if self.progress_callback:
+                self.progress_callback(processed_size, progress_total)
+
+        with self.copy_semaphore or contextlib.nullcontext():  # 批量隐写时限制同时复制外壳文件的任务数
+            method = copy_file_data(cover_file, output, length, progress=report)
+        return processed_size, method
+
     def read_in_chunks(self, file_object, chunk_size=8*1024*1024):
         while True:
             data = file_object.read(chunk_size)
@@ -1652,23 +3720,15 @@ class Steganographier:
                 break
             yield data
 
-    def write_to_log_file(self, message):
-        """优化的日志写入 - 使用缓冲"""
-        if self.enable_log_file and self.log_file_handle:
-            with self.log_lock:
-                try:
-                    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    log_message = f"[{timestamp}] {message}"
-                    self.log_file_handle.write(log_message + "\n")
-                    # 优化：不要每次都flush，让系统自动缓冲
-                    # self.log_file_handle.flush()  # 注释掉这行
-                except Exception as e:
-                    print(f"写入日志文件失败: {e}")
+    def write_to_log_file(self, message, **fields):
+        """日志写入: 只提交到后台写入线程, 不在调用线程中做文件I/O; fields 为结构化字段(job/stage/bytes/duration 等)"""
+        if self.enable_log_file and self.log_writer:
+            self.log_writer.write(message, **fields)
 
-    def log(self, message): 
-        """日志记录方法，支持控制台和GUI显示，并写入日志文件"""
+    def log(self, message, **fields): 
+        """日志记录方法，支持控制台和GUI显示，并写入日志文件(fields 只写入日志文件)"""
         # 先写入日志文件（最优先）
-        self.write_to_log_file(message)
+        self.write_to_log_file(message, **fields)
         
         # 控制台/GUI 显示
         if self.gui_enabled == False:   # CLI模式
@@ -1697,26 +3757,102 @@ class Steganographier:
                 return candidate
             counter += 1
 
+    def _filter_passwords(self, zip_file, password_list):
+        """
+        解压前用第一个加密成员的校验值筛选密码列表, 返回按原顺序产出通过校验的密码的迭代器(见 iter_zip_passwords)
+        校验数据在调用时立即读取, 之后 zip_file 可以关闭; 同一次解除隐写中已完整校验过的ZIP直接复用结果; 读取校验数据出错时原样返回
+        """
+        password_list = self._rank_passwords(password_list, zip_file)
+        try:
+            password_check = read_zip_password_check(zip_file)
+        except Exception as e:
+            self.log(f"密码预校验出错, 将逐个尝试所有密码: {e}")
+            return password_list
+        key = (password_check, tuple(password_list))
+        if key in self._password_check_cache:
+            return self._password_check_cache[key]
+
+        def verified_passwords():
+            start_time = time.time()
+            matched = []
+            for password in iter_zip_passwords(password_check, password_list, self.password_check_workers):
+                matched.append(password)
+                yield password
+            self._password_check_cache[key] = matched
+            if password_check is not None:
+                self.log(f"密码预校验: {len(password_list)} 个密码中 {len(matched)} 个通过校验, 用时 {time.time() - start_time:.2f}s")
+        return verified_passwords()
+
+    def _rank_passwords(self, password_list, zip_file=None):
+        """按命中统计对密码排序(见 PasswordStatsStore), 传入 zip_file 时加入其注释中隐写日期的上下文"""
+        if zip_file is not None and self._reveal_file_path:
+            for context in password_stats_contexts(self._reveal_file_path, zip_file.comment):
+                if context not in self._reveal_contexts:
+                    self._reveal_contexts.append(context)
+        try:
+            return get_password_stats_store().rank(password_list, self._reveal_contexts, pinned=self._reveal_password)
+        except Exception as e:
+            self.log(f"读取密码命中统计失败: {e}")
+            return list(password_list)
+
+    def _record_password_hit(self):
+        """解除隐写成功后记录所用的密码(空密码不记录)"""
+        if not self._revealed_password:
+            return
+        try:
+            store = get_password_stats_store()
+            store.record_hit(self._revealed_password, self._reveal_contexts)
+            store.save()
+        except Exception as e:
+            self.log(f"保存密码命中统计失败: {e}")
+
     def _maybe_log_rename(self, original_path, resolved_path):
         if resolved_path != original_path:
             self.log(f"检测到重名，自动重命名为: {os.path.basename(resolved_path)}")
 
-    def _extract_zip_members(self, zip_file, output_dir):
-        """通用ZIP解压流程，支持自动重命名"""
-        for name in zip_file.namelist():
-            clean_name = sanitize_path(name)
-            if not clean_name:
+    def _open_zip_index(self, file_path):
+        """打开附加在文件末尾的ZIP的中央目录索引, 同一次解除隐写中复用(见 reveal_file); 无法识别时抛出 BadZipFile"""
+        if file_path not in self._zip_index_cache:
+            self._zip_index_cache[file_path] = ZipArchiveIndex(file_path)
+        return self._zip_index_cache[file_path]
+
+    def _close_zip_indexes(self):
+        for zip_index in self._zip_index_cache.values():
+            zip_index.close()
+        self._zip_index_cache = {}
+
+    def _extract_zip_members(self, zip_index, output_dir, password_bytes=None):
+        """
+        通用ZIP解压流程，支持自动重命名; zip_index 为 ZipArchiveIndex
+        先读取第一个文件的前1KB验证密码, 密码错误时抛出 RuntimeError(此时还没有创建任何文件)
+        """
+        members = zip_index.members
+        file_count = len(members)
+        processed_size = 0
+        last_progress_update = 0
+        progress_update_threshold = 8 * 1024 * 1024  # 每8MB更新一次进度
+
+        # 先测试能否读取（验证密码）
+        first_file = next((member for member in members if not member['is_dir']), None)
+        if first_file:
+            with zip_index.open(first_file, password_bytes) as test:
+                test.read(1024)  # 读取1KB测试
+
+        for current_file, member in enumerate(members, 1):
+            if not member['clean_name']:
                 continue
 
-            output_file_path = os.path.join(output_dir, clean_name)
+            output_file_path = os.path.join(output_dir, member['clean_name'])
 
-            if name.endswith('/'):
+            # 处理文件夹
+            if member['is_dir']:
                 try:
                     os.makedirs(output_file_path, exist_ok=True)
                 except OSError:
                     pass
                 continue
 
+            # 确保父目录存在
             output_subdir = os.path.dirname(output_file_path)
             if output_subdir:
                 os.makedirs(output_subdir, exist_ok=True)
@@ -1724,12 +3860,28 @@ class Steganographier:
             resolved_path = self._resolve_conflict_path(output_file_path)
             self._maybe_log_rename(output_file_path, resolved_path)
 
-            with zip_file.open(name) as source, open(resolved_path, 'wb') as target:
+            # 只在开始解压每个文件时记录日志
+            if file_count <= 5 or current_file == 1 or current_file % 10 == 0 or current_file == file_count:
+                self.log(f"正在提取 [{current_file}/{file_count}]: {os.path.basename(output_file_path)}")
+
+            with zip_index.open(member, password_bytes) as source, open(resolved_path, 'wb') as target:
+                # 使用更大的缓冲区
                 while True:
-                    chunk = source.read(8192)
+                    chunk = source.read(32 * 1024 * 1024)  # 32MB
                     if not chunk:
                         break
                     target.write(chunk)
+                    processed_size += len(chunk)
+
+                    # 减少进度更新频率
+                    if processed_size - last_progress_update >= progress_update_threshold:
+                        if self.progress_callback:
+                            self.progress_callback(processed_size, zip_index.total_size)
+                        last_progress_update = processed_size
+
+        # 最后更新进度到100%
+        if self.progress_callback:
+            self.progress_callback(zip_index.total_size, zip_index.total_size)
 
     def _move_extracted_files(self, source_dir, output_dir):
         """将目录内文件移动到目标目录，支持自动重命名"""
@@ -1739,6 +3891,8 @@ class Steganographier:
             rel_root = os.path.relpath(root, source_dir)
             if rel_root == '.':
                 rel_root = ''
+            for dir_name in dirs:  # 保留压缩包中的空文件夹
+                os.makedirs(os.path.join(output_dir, rel_root, dir_name), exist_ok=True)
             for file_name in files:
                 src_path = os.path.join(root, file_name)
                 rel_path = os.path.join(rel_root, file_name) if rel_root else file_name
@@ -1753,11 +3907,16 @@ class Steganographier:
                 shutil.move(src_path, resolved_path)
 
 
-    def initialize_cover_video_files(self):
-        """随机选择模式-初始化剩余可用的外壳文件列表"""
-        cover_video_files = [f for f in os.listdir(self.video_folder_path) if f.endswith(".mp4")]
-        random.shuffle(cover_video_files)  # 随机排序
-        self.remaining_cover_video_files = cover_video_files
+    def get_cover_video_index(self, video_folder_path=None):
+        """返回外壳视频索引, 首次使用或外壳文件夹变化时重新扫描"""
+        video_folder_path = video_folder_path or self.video_folder_path
+        if self.cover_video_index is None or self.cover_video_index.folder_path != video_folder_path:
+            self.cover_video_index = CoverVideoIndex(video_folder_path)
+        return self.cover_video_index
+
+    def refresh_cover_video_index(self):
+        """丢弃外壳视频索引, 下次选择时重新扫描文件夹(每批任务开始前及切换外壳文件夹时调用)"""
+        self.cover_video_index = None
 
     def choose_cover_video_file(self, cover_video_CLI=None, 
                                 processed_files=None, 
@@ -1769,31 +3928,26 @@ class Steganographier:
 
         # 外壳文件选择：GUI模式
         # 1. 检查cover_video中是否存在用来作为外壳的MP4文件（比如海绵宝宝之类, 数量任意, 每次随机选择）
-        cover_video_files = [f for f in os.listdir(video_folder_path) if f.endswith(".mp4")]  # 按默认排序选择
-        cover_video_files = natsorted(cover_video_files, alg=ns.PATH)
-        if not cover_video_files:
+        cover_video_index = self.get_cover_video_index(video_folder_path)
+        if not len(cover_video_index):
             raise Exception(f"{video_folder_path} 文件夹下没有文件, 请添加文件后继续.")
 
         # 2. 否则在cover_video中选择
         if output_cover_video_name_mode == '===============随机选择模式===============':
             # 2-a. 随机选择一个外壳MP4文件用来隐写, 尽量不重复
-            if not self.remaining_cover_video_files:
-                self.initialize_cover_video_files()
-            cover_video = self.remaining_cover_video_files.pop()
+            cover_video = cover_video_index.pick_random()
             self.log(f"已选择隐写外壳文件: {cover_video}")
             print(output_cover_video_name_mode, cover_video)
 
         elif output_cover_video_name_mode == '===============时长顺序模式===============':
             # 2-b. 按时长顺序选择一个外壳MP4文件用来隐写
-            cover_video_files = get_cover_video_files_info(video_folder_path, sort_by_duration=True)  # 按时长顺序选择
-            cover_video = cover_video_files[processed_files % len(cover_video_files)]
-            cover_video = cover_video[:cover_video.rfind('.mp4')] + '.mp4'  # 按最后一个.mp4切分, 以去除后续可能存在的时长大小等内容
+            cover_video = cover_video_index.pick_by_duration(processed_files)
             self.log(f"已选择隐写外壳文件: {cover_video}")
             print(output_cover_video_name_mode, cover_video)
 
         elif output_cover_video_name_mode == '===============名称顺序模式===============':
             # 2-c. 按名称顺序选择一个外壳MP4文件用来隐写
-            cover_video = cover_video_files[processed_files % len(cover_video_files)]
+            cover_video = cover_video_index.pick_by_name(processed_files)
             self.log(f"已选择隐写外壳文件: {cover_video}")
             print(output_cover_video_name_mode, cover_video)
 
@@ -1807,164 +3961,139 @@ class Steganographier:
         # self.log(f'cover_video_path1: {cover_video_path}') # 测试
         return cover_video_path
         
-    def compress_files(self, zip_file_path, input_file_path, processed_size=0, password=None):
-        # 计算文件或文件夹的大小
-        def get_file_or_folder_size(path):
-            total_size = 0
-            if os.path.isfile(path):
-                total_size = os.path.getsize(path)
-            elif os.path.isdir(path):
-                for dirpath, dirnames, filenames in os.walk(path):
-                    for f in filenames:
-                        fp = os.path.join(dirpath, f)
-                        total_size += os.path.getsize(fp)
-            return total_size
-
-        # 计算文件或文件夹的 SHA-256 哈希值
-        def compute_sha256(path):
+    def compress_files(self, zip_file_path, input_file_path, processed_size=0, password=None, progress_total=None, file_list=None):
+        # zip_file_path 既可以是zip文件路径, 也可以是已打开的可写二进制文件对象(此时从其当前位置开始写入ZIP)
+        # progress_total 为进度条总量, 不指定时使用被压缩文件的总大小
+        # file_list 为 collect_input_files 的扫描结果, 不指定时在此处扫描一次
+        # 每个文件只读取一遍: 同一块数据既用于更新 SHA-256, 也直接写入 ZIP
+        if file_list is None:
+            file_list, self.total_file_size = collect_input_files(input_file_path)
+        else:
+            self.total_file_size = sum(size for _, _, size in file_list)
+
+        file_digests = {}  # 每个文件内容的 SHA-256 摘要, 用于最后合成注释中的哈希值
+
+        def compute_sha256():
+            """由各文件的摘要合成 SHA-256 哈希值: 单个文件即为其内容的哈希; 文件夹按扫描顺序依次计入文件名和文件摘要"""
+            if os.path.isfile(input_file_path):
+                return file_digests[input_file_path].hex()
             sha256_hash = hashlib.sha256()
-            if os.path.isfile(path):
-                with open(path, 'rb') as f:
-                    for byte_block in iter(lambda: f.read(4096), b''):
-                        sha256_hash.update(byte_block)
-            elif os.path.isdir(path):
-                # 对于文件夹，按照文件名排序，递归计算所有文件的哈希值并更新
-                for root, dirs, files in os.walk(path):
-                    for names in sorted(files):
-                        filepath = os.path.join(root, names)
-                        sha256_hash.update(names.encode())  # 更新文件名到哈希
-                        with open(filepath, 'rb') as f:
-                            for byte_block in iter(lambda: f.read(4096), b''):
-                                sha256_hash.update(byte_block)
+            for file_full_path, _, _ in file_list:
+                sha256_hash.update(os.path.basename(file_full_path).encode())  # 更新文件名到哈希
+                sha256_hash.update(file_digests[file_full_path])
             return sha256_hash.hexdigest()
 
-        # 计算输入文件或文件夹的总大小
-        self.total_file_size = get_file_or_folder_size(input_file_path)
-        
-        # 计算 SHA-256 哈希值
-        sha256_value = compute_sha256(input_file_path)
-
         # 计算时间戳及其哈希值
         readable_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
         time_hash =  hashlib.sha256(readable_time.encode()).hexdigest()
-        
-        # 准备要添加到 ZIP 注释中的信息
-        zip_comment = f"SHA-256 Hash of '{os.path.basename(input_file_path)}':\n{sha256_value}\nTimestamp '{readable_time}'\nTimehash '{time_hash}'"
-
-        if password:
-            # 当设置了密码时，使用 pyzipper 进行 AES 加密
-            zip_file = pyzipper.AESZipFile(zip_file_path, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES)
-            zip_file.setpassword(password.encode('utf-8')) 
-            # print(f"使用密码: '{password.encode()}' (不指定编码)")
-            # print(f"使用密码: '{password.encode('ansi')}' (ansi编码)")
-            # print(f"使用密码: '{password.encode('utf-8')}' (utf-8编码)")
-
-            with zip_file:
-                self.log(f"Compressing file with encryption: {input_file_path}")
-                self.log("较大的文件可能会花费较长时间...")
-
-                # 收集所有需要压缩的文件
-                file_list = []
 
-                if os.path.isdir(input_file_path):
-                    root_folder = os.path.basename(input_file_path)
-                    for root, dirs, files in os.walk(input_file_path):
-                        for file in files:
-                            file_full_path = os.path.join(root, file)
-                            arcname = os.path.join(root_folder, os.path.relpath(file_full_path, start=input_file_path))
-                            file_list.append((file_full_path, arcname))
-                else:
-                    file_full_path = input_file_path
-                    arcname = os.path.basename(input_file_path)
-                    file_list.append((file_full_path, arcname))
-
-                # 随机化文件列表顺序
-                random.shuffle(file_list)
-
-                for file_full_path, arcname in file_list:
-                    # 选择压缩方法为仅存储加快效率
-                    compress_type = random.choice([pyzipper.ZIP_STORED]) # pyzipper.ZIP_DEFLATED
+        # 随机化文件列表顺序
+        members = list(file_list)
+        random.shuffle(members)
 
-                    # 将文件写入 ZIP 存档
-                    zip_file.write(file_full_path, arcname=arcname, compress_type=compress_type)
-
-                    # 更新已处理的大小并更新进度条
-                    processed_size += os.path.getsize(file_full_path)
-                    if self.progress_callback:
-                        self.progress_callback(processed_size, self.total_file_size)
+        if password:
+            # 当设置了密码时，使用多线程并行加密引擎: 各数据块在线程池中做 AES-CTR 加密, 输出与 pyzipper 的 WinZip-AES 格式一致
+            self.log(f"Compressing file with encryption: {input_file_path}")
+            self.log("较大的文件可能会花费较长时间...")
+            password_bytes = password.encode('utf-8')
 
-                # 设置 ZIP 文件的注释
-                zip_file.comment = zip_comment.encode('utf-8')
+            def make_encoder(file_full_path, arcname, size):
+                # 选择压缩方法为仅存储加快效率
+                external_attr = (os.stat(file_full_path).st_mode & 0xFFFF) << 16
+                return AESMemberEncoder(arcname, size, random_zip_date_time(), password_bytes, external_attr)
 
         else:
-            # 当未设置密码时，使用 zipfile 模块，这样可以设置 compresslevel 等
-            zip_file = zipfile.ZipFile(zip_file_path, 'w')
-
-            with zip_file:
-                self.log(f"Compressing file without encryption: {input_file_path}")
-                self.log("较大的文件可能会花费较长时间...")
-
-                # 收集所有需要压缩的文件
-                file_list = []
-
-                if os.path.isdir(input_file_path):
-                    root_folder = os.path.basename(input_file_path)
-                    for root, dirs, files in os.walk(input_file_path):
-                        for file in files:
-                            file_full_path = os.path.join(root, file)
-                            arcname = os.path.join(root_folder, os.path.relpath(file_full_path, start=input_file_path))
-                            file_list.append((file_full_path, arcname))
-                else:
-                    file_full_path = input_file_path
-                    arcname = os.path.basename(input_file_path)
-                    file_list.append((file_full_path, arcname))
-
-                # 随机化文件列表顺序
-                random.shuffle(file_list)
-
-                for file_full_path, arcname in file_list:
-                    # 随机选择压缩方法
-                    compress_type = random.choice([zipfile.ZIP_DEFLATED, zipfile.ZIP_DEFLATED]) # , zipfile.ZIP_STORED
-
-                    # 如果使用 ZIP_DEFLATED，随机选择压缩等级
-                    if compress_type == zipfile.ZIP_DEFLATED:
-                        compresslevel = random.randint(1, 9)  # 压缩等级 1-9
-                    else:
-                        compresslevel = None  # 对于 ZIP_STORED，压缩等级无效, 目前暂不启用
+            # 当未设置密码时，使用多线程并行压缩引擎: 各成员(大文件切分为独立压缩的数据块)在线程池中 deflate, 再按顺序拼接成一个ZIP
+            self.log(f"Compressing file without encryption: {input_file_path}")
+            self.log("较大的文件可能会花费较长时间...")
+
+            def make_encoder(file_full_path, arcname, size):
+                # 随机选择压缩方法
+                compress_type = random.choice([zipfile.ZIP_DEFLATED, zipfile.ZIP_DEFLATED]) # , zipfile.ZIP_STORED
+                external_attr = (os.stat(file_full_path).st_mode & 0xFFFF) << 16
+                # 使用随机生成的文件日期和时间
+                if compress_type == zipfile.ZIP_DEFLATED:
+                    # 如果使用 ZIP_DEFLATED，随机选择压缩等级 1-9
+                    return DeflateMemberEncoder(arcname, size, random_zip_date_time(), external_attr,
+                                                compresslevel=random.randint(1, 9))
+                return ZipMemberEncoder(arcname, size, random_zip_date_time(), external_attr)  # 对于 ZIP_STORED，压缩等级无效, 目前暂不启用
+
+        zip_target = open(zip_file_path, 'wb') if isinstance(zip_file_path, str) else zip_file_path
+        try:
+            with self.compress_semaphore or contextlib.nullcontext():  # 批量隐写时限制同时压缩的任务数
+                writer = ZipStreamWriter(zip_target)
+                processed_size = self._write_zip_members(writer, members, make_encoder, file_digests,
+                                                         processed_size, progress_total or self.total_file_size)
+                # 设置 ZIP 文件的注释
+                writer.close(self.build_zip_comment(input_file_path, compute_sha256(), readable_time, time_hash))
+        finally:
+            if zip_target is not zip_file_path:
+                zip_target.close()
 
-                    # 随机生成文件日期和时间
+    def _write_zip_members(self, writer, members, make_encoder, file_digests, processed_size, progress_total):
+        """
+        并行ZIP写入流水线: 主线程按顺序读取每个文件(同时更新SHA-256和CRC), 数据块交给线程池编码,
+        编码结果再按提交顺序写入, 同时在途的数据块数量有上限以限制内存占用
+        返回更新后的已处理大小
+        """
+        workers = self.compress_workers or os.cpu_count() or 1
+        max_in_flight = workers * 2
+        pending = collections.deque()  # 按写入顺序排列的事件: ('begin'|'block'|'end', 编码器, 附带数据)
+        in_flight = 0
+
+        def write_next():
+            nonlocal in_flight, processed_size
+            kind, encoder, payload = pending.popleft()
+            if kind == 'begin':
+                compress_type, flag_bits, extra = encoder.header_fields()
+                writer.begin_member(encoder.arcname, encoder.date_time, compress_type, encoder.file_size,
+                                    flag_bits=flag_bits, extra=extra, external_attr=encoder.external_attr)
+                writer.write(encoder.prefix())
+            elif kind == 'block':
+                future, raw_size = payload
+                data = future.result()
+                encoder.consume(data)
+                writer.write(data)
+                in_flight -= 1
+                # 更新已处理的大小并更新进度条
+                processed_size += raw_size
+                if self.progress_callback:
+                    self.progress_callback(processed_size, progress_total)
+            else:
+                writer.write(encoder.suffix())
+                writer.end_member(encoder.header_crc(payload))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for file_full_path, arcname, size in members:
+                encoder = make_encoder(file_full_path, arcname, size)
+                pending.append(('begin', encoder, None))
+                file_hash = hashlib.sha256()
+                crc = 0
+                with open(file_full_path, 'rb') as src:
+                    data = src.read(ZIP_PARALLEL_BLOCK_SIZE)
                     while True:
-                        try:
-                            date_time = (
-                                random.randint(1980, 2099),  # 年
-                                random.randint(1, 12),       # 月
-                                random.randint(1, 28),       # 日
-                                random.randint(0, 23),       # 时
-                                random.randint(0, 59),       # 分
-                                random.randint(0, 59)        # 秒
-                            )
-                            datetime.datetime(*date_time)
+                        next_data = src.read(ZIP_PARALLEL_BLOCK_SIZE) if len(data) == ZIP_PARALLEL_BLOCK_SIZE else b''
+                        last = not next_data
+                        file_hash.update(data)
+                        crc = zlib.crc32(data, crc)
+                        pending.append(('block', encoder, (encoder.submit(executor, data, last), len(data))))
+                        in_flight += 1
+                        while in_flight > max_in_flight:
+                            write_next()
+                        if last:
                             break
-                        except ValueError:
-                            continue
-
-                    # 创建 ZipInfo 对象
-                    zi = zipfile.ZipInfo(filename=arcname, date_time=date_time)
-                    zi.compress_type = compress_type
-
-                    # 将文件写入 ZIP 存档
-                    if compresslevel is not None:
-                        zip_file.write(file_full_path, arcname=arcname, compress_type=compress_type, compresslevel=compresslevel)
-                    else:
-                        zip_file.write(file_full_path, arcname=arcname, compress_type=compress_type)
+                        data = next_data
+                file_digests[file_full_path] = file_hash.digest()
+                pending.append(('end', encoder, crc))
+            while pending:
+                write_next()
 
-                    # 更新已处理的大小并更新进度条
-                    processed_size += os.path.getsize(file_full_path)
-                    if self.progress_callback:
-                        self.progress_callback(processed_size, self.total_file_size)
+        return processed_size
 
-                # 设置 ZIP 文件的注释
-                zip_file.comment = zip_comment.encode('utf-8')
+    def build_zip_comment(self, input_file_path, sha256_value, readable_time, time_hash):
+        """准备要添加到 ZIP 注释中的信息"""
+        zip_comment = f"SHA-256 Hash of '{os.path.basename(input_file_path)}':\n{sha256_value}\nTimestamp '{readable_time}'\nTimehash '{time_hash}'"
+        return zip_comment.encode('utf-8')
 
 
 
@@ -1994,15 +4123,13 @@ class Steganographier:
                                                         video_folder_path=self.video_folder_path)
         # self.log(f"实际隐写外壳文件：{cover_video_path}")
                 
-        # 2. 隐写的临时zip文件名
-        zip_file_path = os.path.join(os.path.dirname(input_file_path), os.path.basename(input_file_path) + f"_hidden_{processed_files}.zip")
-        
-        # 3. 计算要压缩的文件总大小
-        self.total_file_size = get_file_or_folder_size(input_file_path)
+        # 2. 扫描要压缩的文件并计算总大小（只遍历一次, 结果直接交给压缩步骤）
+        file_list, self.total_file_size = collect_input_files(input_file_path)
         self.log(f"要压缩的文件总大小: {self.total_file_size} bytes")
-            
-        processed_size = 0  # 初始化已处理的大小为0
-        self.compress_files(zip_file_path, input_file_path, processed_size=processed_size, password=password)    # 创建隐写的临时zip文件
+
+        # 3. 隐写的临时zip文件名（ZIP一般直接流式写入输出文件, 只有 mkv 模式回退到 mkvmerge 时需要临时zip）
+        zip_file_path = None
+        zip_name = os.path.basename(input_file_path) + f"_hidden_{processed_files}.zip"
 
         try: 
             # 4.1. MP4文件隐写逻辑 - WinRAR版本
@@ -2016,43 +4143,34 @@ class Steganographier:
                 
                 # 计算总大小用于进度显示
                 mp4_size = os.path.getsize(cover_video_path)
-                zip_size = os.path.getsize(zip_file_path)
-                estimated_random_size = 1024 * 20
-                total_size_hidden = mp4_size + zip_size + estimated_random_size
+                total_size_hidden = mp4_size + self.total_file_size
                 processed_size = 0
                 
                 with open(cover_video_path, "rb") as cover_file:
-                    with open(zip_file_path, "rb") as zip_file:
-                        with open(output_file, "wb") as output:
-                            
-                            self.log(f"开始隐写: {input_file_path}")
-                            
-                            # 步骤1: 写入完整的MP4数据
-                            for chunk in self.read_in_chunks(cover_file):
-                                output.write(chunk)
-                                processed_size += len(chunk)
-                                if self.progress_callback:
-                                    self.progress_callback(processed_size, total_size_hidden)
-                            
-                            mp4_end_pos = output.tell()
-                            self.log(f"MP4数据结束位置: {mp4_end_pos}")
-                            
-                            # 步骤2: 直接附加原始ZIP数据（不修改偏移量）
-                            for chunk in self.read_in_chunks(zip_file):
-                                output.write(chunk)
-                                processed_size += len(chunk)
-                                if self.progress_callback:
-                                    self.progress_callback(processed_size, total_size_hidden)
-                            
-                            zip_end_pos = output.tell()
-                            self.log(f"ZIP数据位置: {mp4_end_pos} - {zip_end_pos}")
-                            
-                            # 步骤3: 添加随机化数据
-                            self.add_randomization_data(output)
-                            
-                            final_size = output.tell()
-                            self.log(f"最终文件大小: {final_size} bytes")
-                            
+                    with open(output_file, "wb") as output:
+                        
+                        self.log(f"开始隐写: {input_file_path}")
+                        
+                        # 步骤1: 写入完整的MP4数据(优先使用 reflink / copy_file_range 等内核复制方式)
+                        processed_size, copy_method = self.copy_cover_data(cover_file, output, None, processed_size, total_size_hidden)
+                        self.log(f"外壳文件复制方式: {copy_method}")
+                        
+                        mp4_end_pos = output.tell()
+                        self.log(f"MP4数据结束位置: {mp4_end_pos}")
+                        
+                        # 步骤2: 将ZIP直接流式写入输出文件（本地文件头、数据和中央目录一次写成, 偏移量以输出文件开头为基准）
+                        self.compress_files(output, input_file_path, processed_size=processed_size, 
+                                            password=password, progress_total=total_size_hidden, file_list=file_list)
+                        
+                        zip_end_pos = output.tell()
+                        self.log(f"ZIP数据位置: {mp4_end_pos} - {zip_end_pos}")
+                        
+                        # 步骤3: 添加随机化数据
+                        self.add_randomization_data(output)
+                        
+                        final_size = output.tell()
+                        self.log(f"最终文件大小: {final_size} bytes")
+                        
 
             # 4.2. 隐写mkv文件的逻辑
             elif self.type_option_var == 'mkv':
@@ -2064,38 +4182,54 @@ class Steganographier:
                                                         self.output_cover_video_name_mode,
                                                         cover_video_path)
                 
-                # 生成末尾随机字节
-                random_data_path = f"temp_{generate_random_filename(length=16)}"
-                try:
-                    with open(random_data_path, "wb") as f:
-                        random_bytes = os.urandom(1024*8)  # 8kb
-                        f.write(random_bytes)
-
-                    self.log(f"Output file: {output_file}")
-                    cmd = [
-                        self.mkvmerge_exe, '-o',
-                        output_file, cover_video_path,
-                        '--attach-file', zip_file_path,
-                        '--attach-file', random_data_path,
-                    ]
-                    self.log(f"Hiding file: {input_file_path}")
-                    result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-                    
-                    # 删除临时随机字节
-                    os.remove(random_data_path)
+                self.log(f"Output file: {output_file}")
 
-                    if result.returncode != 0:
-                        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout, stderr=result.stderr)
+                # 外壳为Matroska文件(MP4外壳先由 mkvmerge 转换一次并缓存)时直接在末尾追加附件, 不重新封装视频
+                matroska_cover = self.get_matroska_cover(cover_video_path)
+                mkv_layout = read_mkv_layout(matroska_cover) if matroska_cover else None
+                if mkv_layout:
+                    self.log(f"Hiding file: {input_file_path}")
+                    self.hide_in_mkv_attachments(matroska_cover, output_file, mkv_layout, input_file_path, zip_name,
+                                                 password=password, file_list=file_list)
+                else:
+                    # 无法直接追加时使用 mkvmerge 重新封装: 先生成临时zip文件, 末尾随机字节写在临时目录中
+                    if self.total_file_size > 2 * 1024 * 1024 * 1024:
+                        raise ValueError("外壳视频无法直接追加附件, 使用 mkvmerge 时不能隐写超过 2GB 的文件")
+                    zip_file_path = os.path.join(os.path.dirname(input_file_path), zip_name)
+                    self.compress_files(zip_file_path, input_file_path, processed_size=0, password=password, file_list=file_list)
+                    random_data_dir = tempfile.mkdtemp(prefix='steg_')
+                    random_data_path = os.path.join(random_data_dir, f"temp_{generate_random_filename(length=16)}")
+                    try:
+                        with open(random_data_path, "wb") as f:
+                            random_bytes = os.urandom(1024*8)  # 8kb
+                            f.write(random_bytes)
+
+                        cmd = [
+                            self.mkvmerge_exe, '-o',
+                            output_file, cover_video_path,
+                            '--attach-file', zip_file_path,
+                            '--attach-file', random_data_path,
+                        ]
+                        self.log(f"Hiding file: {input_file_path}")
+                        with self.copy_semaphore or contextlib.nullcontext():  # mkvmerge 以磁盘读写为主
+                            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
+
+                        if result.returncode != 0:
+                            raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout, stderr=result.stderr)
+
+                    except subprocess.CalledProcessError as cpe:
+                        self.log(f"隐写时发生错误: {str(cpe)}")
+                        self.log(f'CalledProcessError output：{cpe.output}') if cpe.output else None
+                        self.log(f'CalledProcessError stderr：{cpe.stderr}') if cpe.stderr else None
+                        raise
 
-                except subprocess.CalledProcessError as cpe:
-                    self.log(f"隐写时发生错误: {str(cpe)}")
-                    self.log(f'CalledProcessError output：{cpe.output}') if cpe.output else None
-                    self.log(f'CalledProcessError stderr：{cpe.stderr}') if cpe.stderr else None
-                    raise
+                    except Exception as e:
+                        self.log(f"在执行mkvmerge时发生未预料的错误: {str(e)}")
+                        raise
 
-                except Exception as e:
-                    self.log(f"在执行mkvmerge时发生未预料的错误: {str(e)}")
-                    raise
+                    finally:
+                        # 删除临时随机字节
+                        shutil.rmtree(random_data_dir, ignore_errors=True)
 
             # 4.3. 适用于 zarchiver 的 MP4文件隐写逻辑
             elif self.type_option_var == 'mp4(zarchiver)':
@@ -2111,7 +4245,7 @@ class Steganographier:
             
                 try:
                     # 读取原始MP4文件的原子结构
-                    atoms = self.read_mp4_atoms(cover_video_path)
+                    atoms = get_cover_video_info(cover_video_path)['atoms']  # 原子结构优先从外壳视频信息缓存读取
                     ftyp_atom = None
                     
                     # 查找ftyp原子
@@ -2123,19 +4257,14 @@ class Steganographier:
                     if not ftyp_atom:
                         raise ValueError("无法找到ftyp原子，这可能不是有效的MP4文件")
                     
-                    # 读取隐藏数据
-                    with open(zip_file_path, "rb") as zip_file:
-                        hidden_data = zip_file.read()
-                    
-                    # 创建包含隐藏数据的free原子
-                    free_atom_with_data = self.create_free_atom_with_data(hidden_data)
-                    
-                    # 计算偏移调整量（插入的free原子大小）
-                    offset_adjustment = len(free_atom_with_data)
-                    
                     # 计算总大小用于进度显示
-                    total_size_hidden = os.path.getsize(cover_video_path) + len(free_atom_with_data)
+                    cover_size = os.path.getsize(cover_video_path)
+                    total_size_hidden = cover_size + self.total_file_size
                     processed_size = 0
+
+                    # ZIP大小在写完之前未知, 按输入大小预估是否需要large size格式的free原子头部(写完后再回填实际大小)
+                    estimated_zip_size = self.total_file_size * 1.05 + len(file_list) * 1024 + 65536
+                    free_header_size = 16 if estimated_zip_size + 8 > 0xFFFFFFFF else 8
                     
                     with open(cover_video_path, "rb") as cover_file:
                         with open(output_file, "wb") as output:
@@ -2149,78 +4278,44 @@ class Steganographier:
                             if self.progress_callback:
                                 self.progress_callback(processed_size, total_size_hidden)
                             
-                            # 2. 写入包含隐藏数据的free原子
-                            output.write(free_atom_with_data)
-                            processed_size += len(free_atom_with_data)
-                            if self.progress_callback:
-                                self.progress_callback(processed_size, total_size_hidden)
-                            
-                            # 3. 写入剩余的原子数据，并更新偏移量引用
-                            cover_file.seek(ftyp_atom['offset'] + ftyp_atom['size'])
-                            remaining_data = cover_file.read()
+                            # 2. 写入包含隐藏数据的free原子: 先写占位头部, ZIP直接流式写入其后(偏移量以ZIP开头为基准), 最后回填原子大小
+                            free_atom_offset = output.tell()
+                            output.write(self.create_free_atom_header(free_header_size, free_header_size == 16))
+                            self.compress_files(ZipOffsetWriter(output), input_file_path, processed_size=processed_size,
+                                                password=password, progress_total=total_size_hidden, file_list=file_list)
+                            processed_size += self.total_file_size
+
+                            # 计算偏移调整量（插入的free原子大小）
+                            offset_adjustment = output.tell() - free_atom_offset
+                            if free_header_size == 8 and offset_adjustment > 0xFFFFFFFF:
+                                raise RuntimeError("隐藏数据超过4GB, free原子大小预估失败")
+                            output.seek(free_atom_offset)
+                            output.write(self.create_free_atom_header(offset_adjustment, free_header_size == 16))
+                            output.seek(free_atom_offset + offset_adjustment)
                             
-                            # 解析并更新剩余原子中的偏移量
-                            pos = 0
-                            while pos < len(remaining_data):
-                                if pos + 8 > len(remaining_data):
-                                    # 剩余数据不足，直接写入
-                                    output.write(remaining_data[pos:])
-                                    break
-                                
-                                # 读取原子头部
-                                size = struct.unpack('>I', remaining_data[pos:pos + 4])[0]
-                                atom_type = remaining_data[pos + 4:pos + 8].decode('ascii', errors='ignore')
-                                
-                                if size == 0:  # 原子延续到文件末尾
-                                    size = len(remaining_data) - pos
-                                elif size == 1:  # large size
-                                    if pos + 16 > len(remaining_data):
-                                        output.write(remaining_data[pos:])
-                                        break
-                                    size = struct.unpack('>Q', remaining_data[pos + 8:pos + 16])[0]
-                                
-                                if size < 8 or pos + size > len(remaining_data):
-                                    # 无效的原子大小，写入剩余所有数据
-                                    output.write(remaining_data[pos:])
-                                    break
-                                
-                                # 提取原子数据
-                                atom_data = remaining_data[pos:pos + size]
-                                
-                                # 更新偏移量引用
-                                updated_atom_data = self.find_and_update_offsets_in_atom(atom_data, atom_type, offset_adjustment)
-                                
-                                # 写入更新后的原子数据
-                                output.write(updated_atom_data)
-                                processed_size += len(updated_atom_data)
-                                if self.progress_callback:
-                                    self.progress_callback(processed_size, total_size_hidden)
-                                
-                                pos += size
+                            # 3. 写入剩余的原子数据: 只有需要更新偏移量引用的原子(moov等)读入内存, 其余(mdat等)分块流式复制
+                            remaining_atoms = [atom for atom in atoms if atom['offset'] >= ftyp_atom['offset'] + ftyp_atom['size']]
+                            patched_atoms = self.patch_mp4_offset_atoms(cover_file, remaining_atoms, offset_adjustment)
+                            for atom in remaining_atoms:
+                                if atom['offset'] in patched_atoms:
+                                    # 更新偏移量引用后的原子
+                                    output.write(patched_atoms[atom['offset']])
+                                    processed_size += atom['size']
+                                    if self.progress_callback:
+                                        self.progress_callback(processed_size, total_size_hidden)
+                                else:
+                                    cover_file.seek(atom['offset'])
+                                    processed_size, _ = self.copy_cover_data(cover_file, output, atom['size'], processed_size, total_size_hidden)
+
+                            # 原子结构之后不足一个原子头部的剩余字节原样写入
+                            cover_file.seek(0, 2)
+                            atoms_end = atoms[-1]['offset'] + atoms[-1]['size']
+                            if atoms_end < cover_file.tell():
+                                cover_file.seek(atoms_end)
+                                output.write(cover_file.read())
                             
-                                                        # 4. 添加随机压缩文件特征码（哈希随机化处理）
-                                head_signatures = {
-                                    "RAR4":  b'\x52\x61\x72\x21\x1A\x07\x00',
-                                    "RAR5":  b'\x52\x61\x72\x21\x1A\x07\x01\x00',
-                                    "7Z":    b'\x37\x7A\xBC\xAF\x27\x1C',
-                                    "ZIP":   b'\x50\x4B\x03\x04',
-                                    "GZIP":  b'\x1F\x8B',
-                                    "BZIP2": b'\x42\x5A\x68',
-                                    "XZ":    b'\xFD\x37\x7A\x58\x5A\x00',
-                                }
-
-                                # 添加第一个随机压缩文件特征码
-                                random_bytes = os.urandom(1024 * random.randint(5, 10))  # 5KB - 10KB 的随机字节
-                                output.write(random.choice(list(head_signatures.values())))  # 随机压缩文件特征码
-                                output.write(random_bytes)
-
-                                # 添加第二个随机压缩文件特征码
-                                output.write(random.choice(list(head_signatures.values())))  # 第二个压缩文件特征码
-                                random_bytes = os.urandom(1024 * random.randint(5, 10))  # 5KB - 10KB 的随机字节
-                                output.write(random_bytes)
-
-                                # 添加 MP4 文件的结尾标记 (空的 "mdat" box)
-                                self.add_empty_mdat_box(output)
+                            # 4. 添加随机压缩文件特征码（哈希随机化处理）及 MP4 文件的结尾标记 (空的 "mdat" box)
+                            self.add_randomization_data(output)
                                 
                 except Exception as e:
                     self.log(f"在写入MP4文件时发生未预料的错误: {str(e)}")
@@ -2231,9 +4326,11 @@ class Steganographier:
             raise
         finally:
             # 5. 删除临时zip文件
-            os.remove(zip_file_path)
+            if zip_file_path and os.path.exists(zip_file_path):
+                os.remove(zip_file_path)
 
         self.log(f"Output file created: {os.path.exists(output_file)}\n")
+        return output_file
 
     # 隐写时指定输出文件名+路径的方法
     def get_output_file_path(self, input_file_path=None, 
@@ -2346,21 +4443,105 @@ class Steganographier:
         file_obj.write(mdat_box)
 
 
-    def create_free_atom_with_data(self, hidden_data):
-        """创建包含隐藏数据的free原子"""
-        data_size = len(hidden_data)
-        # free原子总大小 = 8字节头部 + 隐藏数据大小
-        total_size = 8 + data_size
-        
-        # 如果大小超过4GB，使用large size格式
-        if total_size > 0xFFFFFFFF:
-            # large size格式：4字节(1) + 4字节类型 + 8字节实际大小 + 数据
-            header = struct.pack('>I', 1) + b'free' + struct.pack('>Q', total_size + 8)
-            return header + hidden_data
-        else:
-            # 标准格式：4字节大小 + 4字节类型 + 数据
-            header = struct.pack('>I', total_size) + b'free'
-            return header + hidden_data
+    def get_matroska_cover(self, cover_video_path):
+        """
+        返回可以直接追加附件的Matroska外壳文件路径: 外壳本身是Matroska文件时原样返回,
+        否则用 mkvmerge 转换一次并缓存在 modules/mkv_cover_cache 目录(外壳文件大小或修改时间变化后重新转换); 无法转换时返回 None
+        缓存文件名为 <外壳路径哈希>-<大小和修改时间哈希>.mkv, 每个外壳路径只保留当前版本, 重新转换时删除旧版本和异常退出留下的临时文件
+        """
+        with open(cover_video_path, 'rb') as f:
+            if f.read(4) == EBML_MAGIC:
+                return cover_video_path
+        if not os.path.exists(self.mkvmerge_exe):
+            return None
+
+        stat = os.stat(cover_video_path)
+        path_key = hashlib.sha1(os.path.abspath(cover_video_path).encode('utf-8')).hexdigest()[:16]
+        version_key = hashlib.sha1(f"{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8')).hexdigest()[:8]
+        cache_dir = os.path.join(application_path, 'modules', 'mkv_cover_cache')
+        cached_path = os.path.join(cache_dir, f"{path_key}-{version_key}.mkv")
+        with mkv_cover_cache_lock:  # 批量隐写时同一外壳只转换一次
+            if not os.path.exists(cached_path):
+                os.makedirs(cache_dir, exist_ok=True)
+                for name in os.listdir(cache_dir):
+                    if name.startswith(path_key + '-'):
+                        try:
+                            os.remove(os.path.join(cache_dir, name))
+                        except OSError:
+                            pass  # 旧版本仍被占用时下次再删除
+                temp_path = os.path.join(cache_dir, f"{path_key}-{version_key}.tmp.mkv")
+                self.log(f"转换外壳视频为MKV(只需一次): {cover_video_path}")
+                with self.copy_semaphore or contextlib.nullcontext():  # mkvmerge 以磁盘读写为主
+                    result = subprocess.run([self.mkvmerge_exe, '-o', temp_path, cover_video_path],
+                                            capture_output=True, text=True, encoding='utf-8', errors='ignore')
+                if result.returncode != 0:
+                    self.log(f"外壳视频转换失败: {result.stdout.strip()[-500:]}")
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    return None
+                os.replace(temp_path, cached_path)
+        return cached_path
+
+    def hide_in_mkv_attachments(self, cover_video_path, output_file, layout, input_file_path, zip_name, password=None, file_list=None):
+        """
+        在Matroska外壳文件末尾追加 Attachments 元素: 完整复制外壳文件后, ZIP流式写入附件(超过 MKV_ATTACHMENT_CHUNK_SIZE 时分为多个附件),
+        随机字节作为最后一个附件, 最后回填各元素大小和 Segment 大小, 并在 SeekHead 之后的 Void 预留空间足够时加入 Attachments 的定位项
+        """
+        cover_size = os.path.getsize(cover_video_path)
+        total_size_hidden = cover_size + self.total_file_size
+
+        with open(cover_video_path, 'rb') as cover_file:
+            with open(output_file, 'wb') as output:
+                # 1. 复制完整的外壳文件
+                processed_size, copy_method = self.copy_cover_data(cover_file, output, None, 0, total_size_hidden)
+                self.log(f"外壳文件复制方式: {copy_method}")
+
+                # 2. 写入附件: 各元素先写占位大小, ZIP直接流式写入 FileData (偏移量以ZIP开头为基准)
+                attachments_offset = output.tell()
+                output.write(encode_ebml_element_header(MKV_ATTACHMENTS_ID, 0))
+                # ZIP大小在写完之前未知, 按输入大小预估是否需要分块(决定附件是否从 .001 开始编号)
+                estimated_zip_size = self.total_file_size * 1.05 + len(file_list) * 1024 + 65536
+                chunk_writer = MkvAttachmentChunkWriter(output, zip_name, numbered=estimated_zip_size > MKV_ATTACHMENT_CHUNK_SIZE)
+                self.compress_files(chunk_writer, input_file_path, processed_size=processed_size,
+                                    password=password, progress_total=total_size_hidden, file_list=file_list)
+                chunk_writer.finish()
+                self.log(f"ZIP数据位置: {chunk_writer.chunks[0]['data_offset']} - {chunk_writer.end_offset} (附件数: {len(chunk_writer.chunks)})")
+
+                # 3. 随机字节附件（哈希随机化处理）
+                output.write(encode_ebml_element(MKV_ATTACHED_FILE_ID,
+                                                 encode_ebml_element(MKV_FILE_NAME_ID, f"temp_{generate_random_filename(length=16)}".encode('utf-8'))
+                                                 + encode_ebml_element(MKV_FILE_MIME_TYPE_ID, b'application/octet-stream')
+                                                 + encode_ebml_element(MKV_FILE_UID_ID, (random.getrandbits(64) or 1).to_bytes(8, 'big'))
+                                                 + encode_ebml_element(MKV_FILE_DATA_ID, os.urandom(1024 * 8))))
+                final_size = output.tell()
+
+                # 4. 回填元素大小(头部长度不变)
+                output.seek(attachments_offset)
+                output.write(encode_ebml_element_header(MKV_ATTACHMENTS_ID, final_size - output.tell()))
+
+                # 大小超出原字段的表示范围时改为"大小未知"(Segment 为最后一个元素, 可以延续到文件末尾)
+                size_length = layout['segment_size_length']
+                segment_size = min(final_size - layout['segment_start'], (1 << (7 * size_length)) - 1)
+                output.seek(layout['segment_size_offset'])
+                output.write(((1 << (7 * size_length)) | segment_size).to_bytes(size_length, 'big'))
+
+                seekhead_patch = build_mkv_seekhead_patch(cover_file, layout, attachments_offset - layout['segment_start'])
+                if seekhead_patch:
+                    output.seek(layout['seekhead'][0])
+                    output.write(seekhead_patch)
+                else:
+                    self.log("SeekHead 没有预留空间, 附件只能通过顺序扫描找到")
+
+                output.seek(final_size)
+                self.log(f"最终文件大小: {final_size} bytes")
+
+    def create_free_atom_header(self, total_size, large=False):
+        """创建free原子的头部, total_size 为包含头部在内的原子总大小"""
+        if large:
+            # large size格式：4字节(1) + 4字节类型 + 8字节实际大小
+            return struct.pack('>I', 1) + b'free' + struct.pack('>Q', total_size)
+        # 标准格式：4字节大小 + 4字节类型
+        return struct.pack('>I', total_size) + b'free'
 
 
 
@@ -2388,9 +4569,10 @@ class Steganographier:
         
         return passwords
 
-    def reveal_file(self, input_file_path, password=None, type_option_var=None, delete_original=True, auto_rename_on_conflict=None):
+    def reveal_file(self, input_file_path, password=None, type_option_var=None, delete_original=True, auto_rename_on_conflict=None, output_dir=None):
         """
         智能解除隐写函数 - 优先使用7-Zip高速解压
+        output_dir 为解压目标文件夹, 不指定时解压到隐写文件所在文件夹; 返回是否解除成功
         """
         self.type_option_var = type_option_var
         if auto_rename_on_conflict is not None:
@@ -2399,16 +4581,24 @@ class Steganographier:
         self.log(f"开始解除隐写: {input_file_path}")
         self.log(f"指定模式: {type_option_var}")
 
-        # 准备密码列表
+        # 准备密码列表: 指定的密码最先尝试, 密码本按历史命中统计排序(同文件夹/同命名模式/同一天隐写的文件曾经用过的密码优先), 最后是空密码
+        self._reveal_file_path = input_file_path
+        self._reveal_password = password or None
+        self._reveal_contexts = password_stats_contexts(input_file_path)
+        self._revealed_password = None
         password_list = []
         if password:
             password_list.append(password)
         password_list.extend(self.passwords)
         if '' not in password_list:
             password_list.append('')
+        password_list = self._rank_passwords(password_list)
 
-        output_dir = os.path.dirname(input_file_path)
+        if not output_dir:
+            output_dir = os.path.dirname(input_file_path)
         if not output_dir: output_dir = '.' # 如果是空字符串,使用当前目录
+        self._password_check_cache = {}  # 密码预校验结果, 各解压方法读到同一ZIP时复用
+        self._zip_index_cache = {}  # 附加在文件末尾的ZIP的中央目录索引, 7-Zip预校验和末尾ZIP提取共用
             
         success = False
         successful_method = None
@@ -2424,9 +4614,26 @@ class Steganographier:
         if os.path.exists(self._7z_exe):
             extraction_methods.insert(0, ('7zip', "7-Zip高速解压"))
             self.log("检测到7z.exe，将优先使用7-Zip解压")
+
+        # ===== 结构探测: 只读文件头尾判断隐写方式, 识别成功时只运行对应的解压方法 =====
+        try:
+            container = probe_hidden_container(input_file_path)
+        except OSError as e:
+            self.log(f"文件结构探测失败: {e}")
+            container = None
         
         # 根据文件类型添加其他方法
-        if file_extension in ['.mp4', '.m4v', '.mov']:
+        if container:
+            method_descs = {
+                'mp4_trailing': "MP4文件末尾ZIP提取（WinRAR兼容）",
+                'mp4_zarchiver': "MP4 ZArchiver模式提取",
+                'free_atom': "MP4 free原子方法",
+                'mkv_attachment': "MKV附件提取",
+            }
+            self.log(f"结构探测: {method_descs[container['type']]}")
+            extraction_methods.append((container['type'], method_descs[container['type']]))
+
+        elif file_extension in ['.mp4', '.m4v', '.mov']:
             if type_option_var == 'mp4':
                 self.log("MP4文件 - 按指定MP4模式处理")
                 extraction_methods.extend([
@@ -2483,16 +4690,15 @@ class Steganographier:
             try:
                 # ===== 7-Zip优先 =====
                 if method_name == '7zip':
-                    # 尝试所有密码
-                    for pwd in password_list:
-                        self.log(f"7-Zip尝试密码: '{pwd}' (len: {len(pwd)})")
-                        if self._extract_with_7zip(input_file_path, pwd, output_dir):
-                            success = True
-                            successful_method = f"{method_desc}（密码: {pwd}）"
-                            break
+                    # 所有密码交给7-Zip统一测试, 压缩包最多只导出一次
+                    pwd = self._extract_with_7zip(input_file_path, password_list, output_dir, container)
+                    if pwd is not None:
+                        self._revealed_password = pwd
+                        success = True
+                        successful_method = f"{method_desc}（密码: {pwd}）"
                     
                 elif method_name == 'mp4_trailing':
-                    success = self._try_mp4_direct_extraction(input_file_path, password_list)
+                    success = self._try_mp4_direct_extraction(input_file_path, password_list, output_dir)
                     
                 elif method_name == 'mp4_zarchiver':
                     success = self.extract_with_offset_correction(input_file_path, output_dir, password_list, self.log)
@@ -2503,7 +4709,7 @@ class Steganographier:
                         self.log(f"free原子方法成功: {message}")
                         
                 elif method_name == 'mkv_attachment':
-                    success = self._try_mkv_extraction(input_file_path, password_list)
+                    success = self._try_mkv_extraction(input_file_path, password_list, output_dir)
                     
                 if success:
                     if not successful_method:  # 如果还没设置成功方法
@@ -2517,8 +4723,12 @@ class Steganographier:
                 self.log(f"方法异常 {method_desc}: {e}")
                 continue
 
+        # 关闭ZIP索引(删除原始文件前必须先关闭)
+        self._close_zip_indexes()
+
         # 处理结果
         if success:
+            self._record_password_hit()
             if delete_original:
                 try:
                     os.remove(input_file_path)
@@ -2535,47 +4745,38 @@ class Steganographier:
             self.log("2. 密码错误")
             self.log("3. 文件损坏")
             self.log("4. 使用了不支持的隐写方法")
+        return success
 
-    def _try_mp4_direct_extraction(self, input_file_path, password_list):
+    def _try_mp4_direct_extraction(self, input_file_path, password_list, output_dir=None):
         """
         尝试直接从MP4文件中提取ZIP内容（普通MP4隐写模式）
         """
         try:
             self.log(f"Loaded passwords (Top 5): {self.passwords[:5]}")
             
-            total_size_hidden = os.path.getsize(input_file_path)
+            output_dir = output_dir or os.path.dirname(input_file_path)
+
+            # 中央目录只解析一次, 所有密码共用; 先读取一次加密成员头部, 只用通过校验的密码尝试解压
+            try:
+                zip_index = self._open_zip_index(input_file_path)
+            except zipfile.BadZipFile as e:
+                self.log(f"文件末尾没有可识别的ZIP数据: {e}")
+                return False
+            self.log(f"ZIP包含 {len(zip_index.members)} 个成员")
             
-            for test_password in password_list:
+            for test_password in self._filter_passwords(zip_index.zip_file, password_list):
                 # 转换密码为bytes（如果有密码）
                 password_bytes = test_password.encode('utf-8') if test_password else None
                 
                 self.log(f"尝试密码: '{test_password}' (len: {len(test_password)})")
                 
-                # 尝试1: 使用标准zipfile（更快，支持标准ZIP加密）
                 try:
-                    success = self._extract_with_zipfile(
-                        input_file_path, 
-                        password_bytes, 
-                        total_size_hidden
-                    )
-                    if success:
-                        self.log(f"使用zipfile解压成功，密码: {test_password}")
-                        return True
-                except (zipfile.BadZipFile, RuntimeError, ValueError) as e:
-                    self.log(f"zipfile解压失败 (可能是AES加密): {str(e)[:100]}")
-                
-                # 尝试2: 使用pyzipper（支持AES加密，但较慢）
-                try:
-                    success = self._extract_with_pyzipper(
-                        input_file_path, 
-                        password_bytes, 
-                        total_size_hidden
-                    )
-                    if success:
-                        self.log(f"使用pyzipper解压成功，密码: {test_password}")
-                        return True
-                except (pyzipper.BadZipFile, RuntimeError, ValueError) as e:
-                    self.log(f"pyzipper解压失败: {str(e)[:100]}")
+                    self._extract_zip_members(zip_index, output_dir, password_bytes)
+                    self.log(f"解压成功，密码: {test_password}")
+                    self._revealed_password = test_password
+                    return True
+                except (zipfile.BadZipFile, RuntimeError, ValueError, zlib.error) as e:
+                    self.log(f"解压失败: {str(e)[:100]}")
                     continue
 
             self.log("所有密码尝试失败，无法解压文件")
@@ -2585,73 +4786,81 @@ class Steganographier:
             self.log(f"MP4直接提取过程出错: {e}")
             return False
 
-    def _extract_with_7zip(self, input_file_path, password, output_dir):
+    def _run_7zip(self, args):
         """
-        7-Zip两步解压（修复中文路径编码问题）
+        运行7z.exe并返回结果（使用系统编码解析输出, 修复中文路径编码问题）
         """
-        import tempfile
-        import shutil
         import locale
-        
+        # Windows默认是GBK/CP936，不是UTF-8
+        return subprocess.run(
+            [self._7z_exe] + args,
+            capture_output=True,
+            text=True,
+            encoding=locale.getpreferredencoding(False),
+            errors='ignore',
+            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+        )
+
+    def _extract_with_7zip(self, input_file_path, password_list, output_dir, container=None):
+        """
+        7-Zip解压, 返回成功的密码, 失败时返回 None
+        ZIP附加在文件末尾时直接以 -tzip 打开原文件; 其他情况只提取一次压缩包到临时目录
+        每个密码先用 `7z t` 测试内层压缩包, 通过后才真正解压
+        """
         temp_dir = None
         try:
             if not os.path.exists(self._7z_exe):
                 self.log("7z.exe不存在")
-                return False
-            
-            # 创建临时目录
-            try:
-                temp_dir = tempfile.mkdtemp(prefix='7z_', dir=output_dir)
-            except (OSError, PermissionError):
-                temp_dir = tempfile.mkdtemp(prefix='7z_extract_')
-            
-            self.log(f"临时目录: {temp_dir}")
-            
-            # ===== 关键修复：获取系统编码 =====
-            # Windows默认是GBK/CP936，不是UTF-8
-            system_encoding = locale.getpreferredencoding(False)
-            self.log(f"系统编码: {system_encoding}")
-            
-            # 步骤1: 提取压缩包
-            self.log("提取压缩包...")
-            
-            cmd_extract = [
-                self._7z_exe,
-                'x',
-                input_file_path,
-                '-t#',
-                f'-o{temp_dir or "."}',
-                '-y'
-            ]
-            
-            result1 = subprocess.run(
-                cmd_extract,
-                capture_output=True,
-                text=True,
-                encoding=system_encoding,  # ✅ 使用系统编码而不是UTF-8
-                errors='ignore',
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-            
-            if result1.returncode != 0:
-                self.log(f"提取失败: {result1.stderr}")
-                return False
-            
-            self.log("提取成功")
+                return None
             
-            # 步骤2: 查找并解压ZIP文件
-            zip_files = [
-                os.path.join(temp_dir, f) for f in os.listdir(temp_dir)
-                if f.lower().endswith(('.zip', '.7z', '.rar'))
-            ]
+            if container and container['type'] == 'mp4_trailing':
+                # 7-Zip可以跳过ZIP之前的视频数据, 不需要先导出压缩包
+                archives = [(input_file_path, ['-tzip'])]
+                # ZIP在文件末尾时可直接读取加密成员头部, 预先筛选密码
+                try:
+                    password_list = self._filter_passwords(self._open_zip_index(input_file_path).zip_file, password_list)
+                except zipfile.BadZipFile:
+                    pass
+            else:
+                # 创建临时目录
+                try:
+                    temp_dir = tempfile.mkdtemp(prefix='7z_', dir=output_dir)
+                except (OSError, PermissionError):
+                    temp_dir = tempfile.mkdtemp(prefix='7z_extract_')
+                
+                self.log(f"临时目录: {temp_dir}")
+                
+                # 步骤1: 提取压缩包（每个文件只做一次, 所有密码共用）
+                self.log("提取压缩包...")
+                result = self._run_7zip(['x', input_file_path, '-t#', f'-o{temp_dir}', '-y'])
+                if result.returncode != 0:
+                    self.log(f"提取失败: {result.stderr}")
+                    return None
+                
+                self.log("提取成功")
+                
+                archives = [
+                    (os.path.join(temp_dir, f), []) for f in os.listdir(temp_dir)
+                    if f.lower().endswith(('.zip', '.7z', '.rar'))
+                ]
+                if not archives:
+                    self.log("未找到压缩文件")
+                    return None
             
-            if not zip_files:
-                self.log("未找到压缩文件")
-                return False
+            # 步骤2: 逐个密码测试, 错误的密码不会写出任何文件
+            for password in password_list:
+                self.log(f"7-Zip尝试密码: '{password}' (len: {len(password)})")
+                password_args = [f'-p{password}' if password else '-p']
+                if all(self._run_7zip(['t', archive] + type_args + password_args + ['-mmt=on']).returncode == 0
+                       for archive, type_args in archives):
+                    break
+            else:
+                self.log("7-Zip: 所有密码测试失败")
+                return None
             
-            # 解压所有ZIP
-            for zf in zip_files:
-                self.log(f"解压: {os.path.basename(zf)}")
+            # 步骤3: 用测试通过的密码解压
+            for archive, type_args in archives:
+                self.log(f"解压: {os.path.basename(archive)}")
 
                 unzip_dir = None
                 unzip_output_dir = output_dir
@@ -2662,32 +4871,13 @@ class Steganographier:
                         unzip_dir = tempfile.mkdtemp(prefix='7z_unzip_')
                     unzip_output_dir = unzip_dir
 
-                cmd_unzip = [
-                    self._7z_exe,
-                    'x',
-                    zf,
-                    f'-o{unzip_output_dir}',
-                    '-y',
-                    '-mmt=on'
-                ]
-                
-                if password:
-                    cmd_unzip.append(f'-p{password}')
-                else:
-                    cmd_unzip.append('-p')
-                
-                result2 = subprocess.run(
-                    cmd_unzip,
-                    capture_output=True,
-                    text=True,
-                    encoding=system_encoding,  # ✅ 使用系统编码
-                    errors='ignore',
-                    creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-                )
+                result = self._run_7zip(['x', archive] + type_args + [f'-o{unzip_output_dir}', '-y', '-mmt=on'] + password_args)
                 
-                if result2.returncode != 0:
-                    self.log(f"解压失败: {result2.stderr}")
-                    return False
+                if result.returncode != 0:
+                    self.log(f"解压失败: {result.stderr}")
+                    if unzip_dir:
+                        shutil.rmtree(unzip_dir, ignore_errors=True)
+                    return None
 
                 if unzip_dir:
                     try:
@@ -2696,13 +4886,13 @@ class Steganographier:
                         shutil.rmtree(unzip_dir, ignore_errors=True)
             
             self.log("7-Zip解压完成")
-            return True
+            return password
             
         except Exception as e:
             self.log(f"异常: {e}")
             import traceback
             self.log(f"详细错误: {traceback.format_exc()}")
-            return False
+            return None
         finally:
             # 清理
             if temp_dir and os.path.exists(temp_dir):
@@ -2711,191 +4901,6 @@ class Steganographier:
                 except:
                     pass
 
-    def _extract_with_zipfile(self, input_file_path, password_bytes, total_size_hidden):
-        """
-        使用标准zipfile库解压
-        """
-        processed_size = 0
-        last_progress_update = 0
-        progress_update_threshold = 8 * 1024 * 1024  # 每8MB更新一次进度
-        
-        with open(input_file_path, "rb") as file_obj:
-            with zipfile.ZipFile(file_obj, 'r') as zip_file:
-                # 设置密码（如果有）
-                if password_bytes:
-                    zip_file.setpassword(password_bytes)
-                
-                file_list = zip_file.namelist()
-                file_count = len(file_list)
-                
-                # 先测试能否读取（验证密码）
-                if file_list:
-                    try:
-                        # 尝试读取第一个文件的前几个字节来验证密码
-                        first_file = [f for f in file_list if not f.endswith('/')][0] if any(not f.endswith('/') for f in file_list) else None
-                        if first_file:
-                            with zip_file.open(first_file) as test:
-                                test.read(1024)  # 读取1KB测试
-                    except RuntimeError as e:
-                        if 'Bad password' in str(e) or 'password required' in str(e).lower():
-                            return False
-                        raise
-                
-                current_file = 0
-                for name in file_list:
-                    current_file += 1
-                    clean_name = sanitize_path(name)
-                    
-                    if not clean_name:
-                        continue
-                    
-                    output_file_path = os.path.join(os.path.dirname(input_file_path), clean_name)
-                    
-                    # 处理文件夹
-                    if name.endswith('/'):
-                        try:
-                            os.makedirs(output_file_path, exist_ok=True)
-                        except OSError:
-                            pass
-                        continue
-                    
-                    # 确保父目录存在
-                    output_dir = os.path.dirname(output_file_path)
-                    if output_dir:
-                        try:
-                            os.makedirs(output_dir, exist_ok=True)
-                        except OSError:
-                            pass
-
-                    resolved_path = self._resolve_conflict_path(output_file_path)
-                    self._maybe_log_rename(output_file_path, resolved_path)
-
-                    # 只在开始解压每个文件时记录日志
-                    if file_count > 5:  # 如果文件多，只显示简化信息
-                        if current_file == 1 or current_file % 10 == 0 or current_file == file_count:
-                            self.log(f"正在提取 [{current_file}/{file_count}]: {os.path.basename(output_file_path)}")
-                    else:
-                        self.log(f"正在提取 [{current_file}/{file_count}]: {os.path.basename(output_file_path)}")
-                    
-                    try:
-                        with zip_file.open(name) as source, open(resolved_path, 'wb') as output:
-                            # 使用更大的缓冲区
-                            while True:
-                                chunk = source.read(32 * 1024 * 1024)  # 32MB
-                                if not chunk:
-                                    break
-                                output.write(chunk)
-                                processed_size += len(chunk)
-                                
-                                # 减少进度更新频率
-                                if processed_size - last_progress_update >= progress_update_threshold:
-                                    if self.progress_callback:
-                                        self.progress_callback(processed_size, total_size_hidden)
-                                    last_progress_update = processed_size
-                                    
-                    except (OSError, IOError) as e:
-                        self.log(f"无法创建文件 {output_file_path}: {e}")
-                        continue
-                
-                # 最后更新进度到100%
-                if self.progress_callback:
-                    self.progress_callback(total_size_hidden, total_size_hidden)
-        
-        return True
-
-    def _extract_with_pyzipper(self, input_file_path, password_bytes, total_size_hidden):
-        """
-        使用pyzipper库解压（支持AES加密，但较慢）
-        """
-        processed_size = 0
-        last_progress_update = 0
-        progress_update_threshold = 8 * 1024 * 1024  # 每8MB更新一次进度
-        
-        with open(input_file_path, "rb") as file_obj:
-            with pyzipper.AESZipFile(file_obj, 'r') as zip_file:
-                # 设置密码（如果有）
-                if password_bytes:
-                    zip_file.setpassword(password_bytes)
-                
-                file_list = zip_file.namelist()
-                file_count = len(file_list)
-                
-                # 先测试能否读取（验证密码）
-                if file_list:
-                    try:
-                        # 尝试读取第一个文件的前几个字节来验证密码
-                        first_file = [f for f in file_list if not f.endswith('/')][0] if any(not f.endswith('/') for f in file_list) else None
-                        if first_file:
-                            with zip_file.open(first_file) as test:
-                                test.read(1024)  # 读取1KB测试
-                    except RuntimeError as e:
-                        if 'Bad password' in str(e) or 'password required' in str(e).lower():
-                            return False
-                        raise
-                
-                current_file = 0
-                for name in file_list:
-                    current_file += 1
-                    clean_name = sanitize_path(name)
-                    
-                    if not clean_name:
-                        continue
-                    
-                    output_file_path = os.path.join(os.path.dirname(input_file_path), clean_name)
-                    
-                    # 处理文件夹
-                    if name.endswith('/'):
-                        try:
-                            os.makedirs(output_file_path, exist_ok=True)
-                        except OSError:
-                            pass
-                        continue
-                    
-                    # 确保父目录存在
-                    output_dir = os.path.dirname(output_file_path)
-                    if output_dir:
-                        try:
-                            os.makedirs(output_dir, exist_ok=True)
-                        except OSError:
-                            pass
-
-                    resolved_path = self._resolve_conflict_path(output_file_path)
-                    self._maybe_log_rename(output_file_path, resolved_path)
-                    
-                    # 只在开始解压每个文件时记录日志
-                    if file_count > 5:  # 如果文件多，只显示简化信息
-                        if current_file == 1 or current_file % 10 == 0 or current_file == file_count:
-                            self.log(f"正在提取 [{current_file}/{file_count}]: {os.path.basename(output_file_path)}")
-                    else:
-                        self.log(f"正在提取 [{current_file}/{file_count}]: {os.path.basename(output_file_path)}")
-                    
-                    try:
-                        with zip_file.open(name) as source, open(resolved_path, 'wb') as output:
-                            # 使用更大的缓冲区
-                            while True:
-                                chunk = source.read(32 * 1024 * 1024)  # 32MB
-                                if not chunk:
-                                    break
-                                output.write(chunk)
-                                processed_size += len(chunk)
-                                
-                                # 减少进度更新频率
-                                if processed_size - last_progress_update >= progress_update_threshold:
-                                    if self.progress_callback:
-                                        self.progress_callback(processed_size, total_size_hidden)
-                                    last_progress_update = processed_size
-                                    
-                    except (OSError, IOError) as e:
-                        self.log(f"无法创建文件 {output_file_path}: {e}")
-                        continue
-                
-                # 最后更新进度到100%
-                if self.progress_callback:
-                    self.progress_callback(total_size_hidden, total_size_hidden)
-        
-        return True
-
-
     def extract_with_offset_correction(self, file_path, output_dir, password_list, log_func):
         """
         带偏移量修正的ZIP提取（适用于ZArchiver兼容模式）
@@ -2936,54 +4941,64 @@ class Steganographier:
                     atom_size = struct.unpack('>I', atom_header[:4])[0]
                     atom_type = atom_header[4:8].decode('ascii', errors='replace')
                     atom_type = ''.join(c if c.isprintable() else '?' for c in atom_type)
+                    header_size = 8
+                    
+                    # 处理large size情况(隐藏数据超过4GB时free原子使用16字节头部)
+                    if atom_size == 1:
+                        large_size = f.read(8)
+                        if len(large_size) < 8:
+                            log_func("到达文件末尾，未找到包含隐藏数据的free原子")
+                            break
+                        atom_size = struct.unpack('>Q', large_size)[0]
+                        header_size = 16
+                    elif atom_size == 0:  # 原子延续到文件末尾
+                        atom_size = os.path.getsize(file_path) - pos
                     
                     log_func(f"检查原子: {atom_type}, 大小: {atom_size}, 位置: {pos}")
                     
                     if atom_type == 'free':
                         log_func(f"找到free原子，位置: {pos}, 大小: {atom_size}")
                         
-                        # 读取free原子的数据部分（跳过8字节头部）
-                        if atom_size <= 8:
+                        # 读取free原子的数据部分（跳过头部）
+                        if atom_size <= header_size:
                             log_func("free原子太小，跳过")
+                            f.seek(pos + header_size)
                             continue
                             
-                        free_data = f.read(atom_size - 8)
+                        # 只读取数据开头的特征码, 之后跳到下一个原子
+                        free_signature = f.read(min(8, atom_size - header_size))
+                        f.seek(pos + atom_size)
                         
                         # 检查是否包含ZIP数据
-                        if len(free_data) >= 4:
+                        if len(free_signature) >= 4:
                             # 检查ZIP文件头 (PK\x03\x04)
-                            if free_data.startswith(b'PK\x03\x04'):
+                            if free_signature.startswith(b'PK\x03\x04'):
                                 log_func("在free原子中找到ZIP数据！")
                                 
-                                # 直接在内存中处理ZIP数据
+                                # 通过文件区间视图直接在原文件中打开ZIP, 不复制数据
                                 try:
                             
-                                    # 尝试用不同密码解压
                                     success = False
-                                    for password in password_list:
-                                        try:
-                                            log_func(f"尝试密码: {'(空密码)' if not password else password}")
-                                            
-                                            # 使用BytesIO创建内存中的ZIP文件对象
-                                            zip_buffer = io.BytesIO(free_data)
-                                            
-                                            with pyzipper.AESZipFile(zip_buffer, 'r') as zip_file:
-                                                if password:
-                                                    zip_file.setpassword(password.encode())
-                                                
-                                                # 列出ZIP内容
-                                                file_list = zip_file.namelist()
-                                                log_func(f"ZIP文件包含: {file_list}")
+                                    with FileWindow(file_path, pos + header_size, pos + atom_size) as free_window, \
+                                         ZipArchiveIndex(free_window) as zip_index:
+                                        # 列出ZIP内容
+                                        log_func(f"ZIP文件包含 {len(zip_index.members)} 个成员")
+
+                                        # 尝试用通过预校验的密码解压
+                                        for password in self._filter_passwords(zip_index.zip_file, password_list):
+                                            try:
+                                                log_func(f"尝试密码: {'(空密码)' if not password else password}")
                                                 
                                                 # 解压所有文件到输出目录（支持自动重命名）
-                                                self._extract_zip_members(zip_file, output_dir)
+                                                self._extract_zip_members(zip_index, output_dir, password.encode() if password else None)
+                                                self._revealed_password = password
                                                 success = True
                                                 log_func(f"成功解压，使用密码: {'(空密码)' if not password else password}")
                                                 break
                                                 
-                                        except Exception as e:
-                                            log_func(f"密码 {'(空密码)' if not password else password} 解压失败: {e}")
-                                            continue
+                                            except Exception as e:
+                                                log_func(f"密码 {'(空密码)' if not password else password} 解压失败: {e}")
+                                                continue
                                     
                                     if success:
                                         log_func("ZArchiver模式解压成功！")
@@ -3003,7 +5018,7 @@ class Steganographier:
                                 
                                 found_signature = False
                                 for sig, format_name in signatures.items():
-                                    if free_data.startswith(sig):
+                                    if free_signature.startswith(sig):
                                         log_func(f"在free原子中找到{format_name}格式数据，但当前只支持ZIP格式")
                                         found_signature = True
                                         break
@@ -3012,7 +5027,7 @@ class Steganographier:
                                     log_func("free原子中的数据不是已知的压缩格式")
                     else:
                         # 跳过当前原子
-                        if atom_size <= 8:
+                        if atom_size < header_size:
                             log_func(f"原子大小异常: {atom_size}")
                             break
                         
@@ -3029,225 +5044,185 @@ class Steganographier:
             return False
 
 
-    def read_mp4_atoms(self, file_path):
-        """读取MP4文件的原子结构，找到ftyp原子的位置和大小"""
-        atoms = []
-        with open(file_path, 'rb') as f:
-            while True:
-                # 读取原子头部（8字节：4字节大小 + 4字节类型）
-                header = f.read(8)
-                if len(header) < 8:
-                    break
-                
-                size = struct.unpack('>I', header[:4])[0]
-                atom_type = header[4:8].decode('ascii', errors='ignore')
-                
-                # 处理large size情况
-                if size == 1:
-                    large_size = struct.unpack('>Q', f.read(8))[0]
-                    atoms.append({
-                        'type': atom_type,
-                        'size': large_size,
-                        'offset': f.tell() - 16,
-                        'header_size': 16
-                    })
-                    f.seek(f.tell() + large_size - 16)
-                elif size == 0:
-                    # 原子延续到文件末尾
-                    current_pos = f.tell()
-                    f.seek(0, 2)  # 跳到文件末尾
-                    file_size = f.tell()
-                    atoms.append({
-                        'type': atom_type,
-                        'size': file_size - current_pos + 8,
-                        'offset': current_pos - 8,
-                        'header_size': 8
-                    })
-                    break
-                else:
-                    atoms.append({
-                        'type': atom_type,
-                        'size': size,
-                        'offset': f.tell() - 8,
-                        'header_size': 8
-                    })
-                    f.seek(f.tell() + size - 8)
-        
-        return atoms
-
-
     def find_and_update_offsets_in_atom(self, atom_data, atom_type, offset_adjustment):
-        """在原子数据中递归查找并更新stco/co64偏移量"""
-        def update_stco_offsets(atom_data, offset_adjustment):
-            """更新stco原子中的chunk偏移量"""
-            if len(atom_data) < 16:
-                return atom_data
-            
-            # stco格式: 8字节头部 + 4字节版本/标志 + 4字节entry_count + entries
-            entry_count = struct.unpack('>I', atom_data[12:16])[0]
-            
-            # 检查数据长度是否足够
-            expected_length = 16 + entry_count * 4
-            if len(atom_data) < expected_length:
-                return atom_data
-            
-            # 更新偏移量
-            updated_data = bytearray(atom_data)
-            for i in range(entry_count):
-                offset_pos = 16 + i * 4
-                old_offset = struct.unpack('>I', atom_data[offset_pos:offset_pos + 4])[0]
-                new_offset = old_offset + offset_adjustment
-                struct.pack_into('>I', updated_data, offset_pos, new_offset)
-            
-            return bytes(updated_data)
+        """在原子数据中递归查找并更新stco/co64偏移量, 返回更新后的数据(bytearray)"""
+        updated_data = bytearray(atom_data)
+        self.update_offsets_in_place(updated_data, 0, len(updated_data), atom_type, offset_adjustment)
+        return updated_data
+
+    def update_offsets_in_place(self, buf, start, end, atom_type, offset_adjustment):
+        """在 buf[start:end] 范围内的原子中原地更新stco/co64偏移量, 嵌套的容器原子不再逐层切片和拼接"""
+        # stco/co64格式: 8字节头部 + 4字节版本/标志 + 4字节entry_count + entries
+        if atom_type in ['stco', 'co64']:
+            if end - start < 16:
+                return
+            entry_width = 4 if atom_type == 'stco' else 8
+            entry_count = struct.unpack_from('>I', buf, start + 12)[0]
 
-        def update_co64_offsets(atom_data, offset_adjustment):
-            """更新co64原子中的chunk偏移量"""
-            if len(atom_data) < 16:
-                return atom_data
-            
-            # co64格式: 8字节头部 + 4字节版本/标志 + 4字节entry_count + entries
-            entry_count = struct.unpack('>I', atom_data[12:16])[0]
-            
             # 检查数据长度是否足够
-            expected_length = 16 + entry_count * 8
-            if len(atom_data) < expected_length:
-                return atom_data
-            
-            # 更新偏移量
-            updated_data = bytearray(atom_data)
-            for i in range(entry_count):
-                offset_pos = 16 + i * 8
-                old_offset = struct.unpack('>Q', atom_data[offset_pos:offset_pos + 8])[0]
-                new_offset = old_offset + offset_adjustment
-                struct.pack_into('>Q', updated_data, offset_pos, new_offset)
-            
-            return bytes(updated_data)
+            if start + 16 + entry_count * entry_width > end:
+                return
+
+            if not add_to_offset_table(buf, start + 16, entry_count, entry_width, offset_adjustment):
+                raise ValueError(f"{atom_type} 原子中的偏移量超出 {entry_width * 8} 位范围")
+            return
 
-        # 在原子数据中递归查找并更新stco/co64偏移量
-        if atom_type in ['stco', 'co64']:
-            if atom_type == 'stco':
-                return update_stco_offsets(atom_data, offset_adjustment)
-            elif atom_type == 'co64':
-                return update_co64_offsets(atom_data, offset_adjustment)
-        
         # 对于容器原子，递归处理子原子
         if atom_type in ['moov', 'trak', 'mdia', 'minf', 'stbl', 'udta']:
-            return self.update_container_atom_offsets(atom_data, offset_adjustment)
-        
-        return atom_data
+            self.update_container_atom_offsets(buf, offset_adjustment, start, end)
 
-    def update_container_atom_offsets(self, container_data, offset_adjustment):
-        """更新容器原子中的所有偏移量引用"""
-        if len(container_data) < 8:
-            return container_data
-        
-        updated_data = bytearray(container_data)
-        pos = 8  # 跳过容器原子的头部
-        
-        while pos < len(container_data):
-            if pos + 8 > len(container_data):
+    def patch_mp4_offset_atoms(self, cover_file, atoms, offset_adjustment):
+        """
+        读取需要更新偏移量引用的顶层原子(moov等)并更新其中的stco/co64, 返回 {原子偏移: 更新后的数据}
+        偏移量加上调整量后超出32位的stco会升级为co64, 原子因此变大; 若该原子位于mdat之前, 媒体数据会再被后移,
+        所以反复计算直到增长量不再变化(升级只会随调整量增大而增多, 一定会收敛)
+        """
+        originals = []
+        for atom in atoms:
+            if atom['type'] in ['moov', 'trak', 'mdia', 'minf', 'stbl', 'udta', 'stco', 'co64']:
+                cover_file.seek(atom['offset'])
+                originals.append((atom, cover_file.read(atom['size'])))
+        first_mdat_offset = next((atom['offset'] for atom in atoms if atom['type'] == 'mdat'), None)
+
+        growth = 0
+        while True:
+            promoted = [self.promote_stco_to_co64(atom_data, atom['type'], offset_adjustment + growth)
+                        for atom, atom_data in originals]
+            new_growth = sum(len(data) - atom['size'] for (atom, _), data in zip(originals, promoted)
+                             if first_mdat_offset is None or atom['offset'] < first_mdat_offset)
+            if new_growth == growth:
                 break
-                
+            growth = new_growth
+
+        if growth:
+            self.log(f"stco 偏移量超出32位, 已升级为 co64, moov 增大 {growth} bytes")
+
+        patched_atoms = {}
+        for (atom, _), data in zip(originals, promoted):
+            data = bytearray(data)
+            self.update_offsets_in_place(data, 0, len(data), atom['type'], offset_adjustment + growth)
+            patched_atoms[atom['offset']] = data
+        return patched_atoms
+
+    def promote_stco_to_co64(self, atom_data, atom_type, offset_adjustment):
+        """
+        偏移量加上 offset_adjustment 后会超出32位的stco原子改写为co64(偏移量本身尚未调整), 并同步修改所有外层容器原子的大小
+        不需要升级时原样返回 atom_data
+        """
+        if atom_type == 'stco':
+            if len(atom_data) < 16:
+                return atom_data
+            entry_count = struct.unpack_from('>I', atom_data, 12)[0]
+            if 16 + entry_count * 4 > len(atom_data) or entry_count == 0:
+                return atom_data
+            table = array.array('I', atom_data[16:16 + entry_count * 4])
+            if sys.byteorder == 'little':
+                table.byteswap()
+            if max(table) + offset_adjustment < 1 << 32:
+                return atom_data
+            table = array.array('Q', table)
+            if sys.byteorder == 'little':
+                table.byteswap()
+            # co64格式与stco相同, 只是每项为8字节
+            return (struct.pack('>I', 16 + entry_count * 8) + b'co64' + bytes(atom_data[8:16])
+                    + table.tobytes() + bytes(atom_data[16 + entry_count * 4:]))
+
+        if atom_type not in ['moov', 'trak', 'mdia', 'minf', 'stbl', 'udta']:
+            return atom_data
+
+        header_size = 16 if len(atom_data) >= 16 and struct.unpack_from('>I', atom_data, 0)[0] == 1 else 8
+        parts = []
+        changed = False
+        pos = header_size
+        for child_pos, child_size, child_type in self.iter_mp4_child_atoms(atom_data, header_size, len(atom_data)):
+            parts.append(atom_data[pos:child_pos])
+            child_data = atom_data[child_pos:child_pos + child_size]
+            new_child_data = self.promote_stco_to_co64(child_data, child_type, offset_adjustment)
+            changed = changed or new_child_data is not child_data
+            parts.append(new_child_data)
+            pos = child_pos + child_size
+        if not changed:
+            return atom_data
+        parts.append(atom_data[pos:])
+        body = b''.join(bytes(part) for part in parts)
+
+        # 重写容器原子头部中的大小
+        if header_size == 16:
+            header = struct.pack('>I', 1) + bytes(atom_data[4:8]) + struct.pack('>Q', 16 + len(body))
+        else:
+            header = struct.pack('>I', 8 + len(body)) + bytes(atom_data[4:8])
+        return header + body
+
+    def iter_mp4_child_atoms(self, container_data, start, end):
+        """依次返回 container_data[start:end] 范围内各子原子的 (位置, 大小, 类型)"""
+        pos = start
+        while pos + 8 <= end:
             # 读取子原子头部
-            size = struct.unpack('>I', container_data[pos:pos + 4])[0]
-            atom_type = container_data[pos + 4:pos + 8].decode('ascii', errors='ignore')
+            size = struct.unpack_from('>I', container_data, pos)[0]
+            atom_type = bytes(container_data[pos + 4:pos + 8]).decode('ascii', errors='ignore')
             
             if size == 0:  # 原子延续到容器末尾
-                size = len(container_data) - pos
+                size = end - pos
             elif size == 1:  # large size
-                if pos + 16 > len(container_data):
+                if pos + 16 > end:
                     break
-                size = struct.unpack('>Q', container_data[pos + 8:pos + 16])[0]
+                size = struct.unpack_from('>Q', container_data, pos + 8)[0]
             
-            if size < 8 or pos + size > len(container_data):
+            if size < 8 or pos + size > end:
                 break
-            
-            # 提取子原子数据并更新
-            atom_data = container_data[pos:pos + size]
-            updated_atom_data = self.find_and_update_offsets_in_atom(atom_data, atom_type, offset_adjustment)
-            
-            # 将更新后的数据写回
-            updated_data[pos:pos + size] = updated_atom_data
-            
+
+            yield pos, size, atom_type
             pos += size
+
+    def update_container_atom_offsets(self, container_data, offset_adjustment, start=0, end=None):
+        """更新容器原子中的所有偏移量引用(container_data 为 bytearray 时原地修改, 并返回更新后的数据)"""
+        if not isinstance(container_data, bytearray):
+            container_data = bytearray(container_data)
+        if end is None:
+            end = len(container_data)
+        if end - start < 8:
+            return container_data
         
-        return bytes(updated_data)
+        # 跳过容器原子的头部, 原地更新各子原子
+        for pos, size, atom_type in self.iter_mp4_child_atoms(container_data, start + 8, end):
+            self.update_offsets_in_place(container_data, pos, pos + size, atom_type, offset_adjustment)
+        
+        return container_data
 
     def extract_from_free_atom(self, file_path, output_dir, password_list):
         """
         从free原子中提取隐藏数据（新版本方法）
         """
-        def extract_zip_data(zip_data, output_dir, password_list):
+        def extract_zip_data(zip_window, output_dir, password_list):
             """
-            尝试解压ZIP数据
+            尝试解压ZIP数据, zip_window 为包含ZIP数据的文件区间视图(FileWindow)
             """
-            temp_zip_path = None
             try:
-                # 写入临时文件
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-                    temp_zip_path = temp_file.name
-                    temp_file.write(zip_data)
-                
-                # 尝试用每个密码解压
-                for password in password_list:
-                    try:
-                        # 首先尝试pyzipper (AES加密)
-                        try:
-                            with pyzipper.AESZipFile(temp_zip_path, 'r') as zip_file:
-                                if password:
-                                    zip_file.setpassword(password.encode())
-                                
-                                # 测试是否能正常读取
-                                namelist = zip_file.namelist()
-                                if not namelist:
-                                    continue
-                                
-                                # 解压所有文件（支持自动重命名）
-                                self._extract_zip_members(zip_file, output_dir)
-                                
-                                return True, f"使用密码 '{password}' 成功解压 (AES)"
-                                
-                        except (pyzipper.BadZipFile, RuntimeError):
-                            pass
-                        
-                        # 然后尝试标准zipfile
+                # 中央目录只解析一次, 所有密码共用
+                with ZipArchiveIndex(zip_window) as zip_index:
+                    if not zip_index.members:
+                        return False, "ZIP中没有文件"
+
+                    # 只用通过预校验的密码尝试解压
+                    for password in self._filter_passwords(zip_index.zip_file, password_list):
                         try:
-                            with zipfile.ZipFile(temp_zip_path, 'r') as zip_file:
-                                if password:
-                                    zip_file.setpassword(password.encode())
-                                
-                                # 测试是否能正常读取
-                                namelist = zip_file.namelist()
-                                if not namelist:
-                                    continue
-                                
-                                # 解压所有文件（支持自动重命名）
-                                self._extract_zip_members(zip_file, output_dir)
-                                
-                                return True, f"使用密码 '{password}' 成功解压 (Standard)"
-                                
-                        except (zipfile.BadZipFile, RuntimeError):
-                            pass
+                            # 解压所有文件（支持自动重命名）
+                            self._extract_zip_members(zip_index, output_dir, password.encode() if password else None)
+                            self._revealed_password = password
                             
-                    except Exception as e:
-                        continue
+                            return True, f"使用密码 '{password}' 成功解压"
+                                
+                        except (zipfile.BadZipFile, RuntimeError, ValueError, zlib.error):
+                            continue
                 
                 return False, "所有密码尝试失败"
                 
             except Exception as e:
                 return False, f"解压ZIP数据时出错: {e}"
-            finally:
-                # 清理临时文件
-                if temp_zip_path and os.path.exists(temp_zip_path):
-                    try:
-                        os.unlink(temp_zip_path)
-                    except:
-                        pass
 
         # 流程正式开始
         try:
-            atoms = self.read_mp4_atoms(file_path)
+            atoms = read_mp4_atoms(file_path)
             
             # 查找包含数据的free原子
             target_free = None
@@ -3259,87 +5234,62 @@ class Steganographier:
             if not target_free:
                 return False, "未找到包含数据的free原子"
             
-            # 提取free原子中的数据
-            with open(file_path, 'rb') as f:
-                f.seek(target_free['offset'] + target_free['header_size'])
-                hidden_data = f.read(target_free['size'] - target_free['header_size'])
-            
-            # 尝试解压数据
-            return extract_zip_data(hidden_data, output_dir, password_list)
+            # 在原文件中直接打开free原子中的数据, 不复制
+            data_start = target_free['offset'] + target_free['header_size']
+            with FileWindow(file_path, data_start, target_free['offset'] + target_free['size']) as free_window:
+                return extract_zip_data(free_window, output_dir, password_list)
             
         except Exception as e:
             return False, f"从free原子提取数据时出错: {e}"
 
-    def _try_mkv_extraction(self, input_file_path, password_list):        
+    def _try_mkv_extraction(self, input_file_path, password_list, output_dir=None):
         """
         尝试MKV附件提取
         """
+        output_dir = output_dir or os.path.dirname(input_file_path)
         try:
-            # 获取mkv附件名称
-            def get_attachment_name(input_file_path):
-                cmd = [self.mkvinfo_exe, input_file_path]
-                try:
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True, encoding='utf-8')
-                    lines = result.stdout.splitlines()
-                    for idx, line in enumerate(lines):
-                        if "MIME" in line:
-                            parts = lines[idx-1].split(':')
-                            attachments_name = parts[1].strip().split()[-1]
-                            return attachments_name
-                except Exception as e:
-                    self.log(f"获取附件时出错: {e}")
-                    return None
-                return None
-
-            # 提取mkv附件
-            def extract_attachment(input_file_path, output_path):
-                cmd = [self.mkvextract_exe, 'attachments', input_file_path, f'1:{output_path}']
-                try:
-                    subprocess.run(cmd, check=True)
-                    return True
-                except subprocess.CalledProcessError as e:
-                    self.log(f"提取附件时出错: {e}")
-                    return False
-
-            attachments_name = get_attachment_name(input_file_path)
-            if not attachments_name:
+            # 直接解析EBML结构读取附件列表, 隐写时最前面的附件为压缩包(较大时分为多个附件), 之后是随机化数据
+            attachments = read_mkv_attachments(input_file_path)
+            if not attachments:
                 self.log("该 MKV 文件中没有可提取的附件")
                 return False
 
-            output_path = os.path.join(os.path.dirname(input_file_path), attachments_name)
-            resolved_path = self._resolve_conflict_path(output_path)
-            self._maybe_log_rename(output_path, resolved_path)
-            output_path = resolved_path
-            output_name = os.path.basename(output_path)
-            self.log(f"提取MKV附件: {output_path}")
-            
-            if not extract_attachment(input_file_path, output_path):
-                return False
-
-            # 如果是ZIP文件，尝试解压
-            if output_name.endswith('.zip'):
-                zip_path = output_path
-                self.log(f"解压ZIP文件: {zip_path}")
+            attachment_name, attachment_ranges = join_mkv_attachment_chunks(attachments)
+            attachment_name = os.path.basename(attachment_name) or 'attachment'
+            if len(attachment_ranges) > 1:
+                self.log(f"附件分为 {len(attachment_ranges)} 块存放")
 
-                for test_password in password_list:
-                    try:
-                        with pyzipper.AESZipFile(zip_path, 'r', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES) as zip_file:
-                            if test_password:
-                                zip_file.setpassword(test_password.encode())
-                            self._extract_zip_members(zip_file, os.path.dirname(input_file_path))
+            # 如果是ZIP文件，在原文件中直接打开附件数据解压
+            if attachment_name.lower().endswith('.zip'):
+                self.log(f"解压MKV附件中的ZIP文件: {attachment_name}")
 
-                        os.remove(zip_path)
-                        self.log(f"ZIP解压成功，使用密码: {test_password}")
-                        return True
+                # 中央目录只解析一次, 所有密码共用; 只用通过预校验的密码尝试解压
+                with FileWindow(input_file_path, ranges=attachment_ranges) as attachment_window, \
+                     ZipArchiveIndex(attachment_window) as zip_index:
+                    for test_password in self._filter_passwords(zip_index.zip_file, password_list):
+                        try:
+                            self._extract_zip_members(zip_index, output_dir, test_password.encode() if test_password else None)
+                            self._revealed_password = test_password
+                            break
+                        except (zipfile.BadZipFile, RuntimeError, ValueError, zlib.error) as e:
+                            self.log(f"使用密码 {test_password} 解压失败: {e}")
+                            continue
 
-                    except RuntimeError as e:
-                        self.log(f"使用密码 {test_password} 解压失败: {e}")
-                        continue
+                if self._revealed_password is not None:
+                    self.log(f"ZIP解压成功，使用密码: {self._revealed_password}")
+                    return True
 
                 self.log("所有密码尝试失败，无法解压ZIP文件")
                 return False
             else:
-                self.log(f"成功提取附件: {output_name}")
+                output_path = os.path.join(output_dir, attachment_name)
+                resolved_path = self._resolve_conflict_path(output_path)
+                self._maybe_log_rename(output_path, resolved_path)
+                self.log(f"提取MKV附件: {resolved_path}")
+                with FileWindow(input_file_path, ranges=attachment_ranges) as attachment_window, \
+                     open(resolved_path, 'wb') as output:
+                    shutil.copyfileobj(attachment_window, output, 1024 * 1024)
+                self.log(f"成功提取附件: {os.path.basename(resolved_path)}")
                 return True
 
         except Exception as e:
@@ -3377,25 +5327,21 @@ class Steganographier:
             if args.reveal_dir:
                 if args.reveal_dir_gui:
                     # 使用GUI模式处理
-                    self.process_hidden_files_with_gui(args.input, delete_original=delete_original_after_reveal)
+                    self.process_hidden_files_with_gui(args.input, delete_original=delete_original_after_reveal,
+                                                       jobs=args.jobs, per_device_jobs=args.per_device_jobs)
                 else:
                     # 使用命令行模式处理
-                    self.process_hidden_files(args.input, delete_original=delete_original_after_reveal)
+                    self.process_hidden_files(args.input, delete_original=delete_original_after_reveal,
+                                              jobs=args.jobs, per_device_jobs=args.per_device_jobs)
                 return
             
+            # 批量隐写
+            if args.batch_tasks is not None:
+                self.run_batch_hide_cli(args)
+                return
+
             # 处理单个文件
             if not args.reveal:
-                # 检查 mkv 模式下文件大小是否超过 2GB
-                if args.type == 'mkv':
-                    input_size = get_file_or_folder_size(args.input)
-                    if input_size > 2 * 1024 * 1024 * 1024:
-                        # 创建临时根窗口以显示弹窗
-                        root = tk.Tk()
-                        root.withdraw()  # 隐藏主窗口
-                        messagebox.showerror("文件大小错误", "mkv 文件不能隐写超过 2GB 的文件")
-                        root.destroy()
-                        sys.exit(1)
-
                 if args.output:
                     output_file = args.output
                 else:
@@ -3418,9 +5364,46 @@ class Steganographier:
             # 确保日志文件被正确关闭
             self.close_log_file()
 
-    def process_hidden_files_with_gui(self, root_dir, delete_original=True):
+    def run_batch_hide_cli(self, args):
+        """
+        命令行批量隐写: 未指定输出路径的任务输出到 -o 指定的文件夹(默认为输入所在文件夹), 文件名为原文件名+"_hidden.mp4/mkv"
+        """
+        tasks = []
+        used_outputs = set()
+        for task in args.batch_tasks:
+            output_file = task['output']
+            if not output_file:
+                input_path = os.path.abspath(task['input']).rstrip('\\/')
+                output_dir = args.output or os.path.dirname(input_path)
+                os.makedirs(output_dir, exist_ok=True)
+                output_file = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(input_path))[0]}_hidden.{args.type}")
+            # 不同输入得到相同的输出路径时(如 a.txt 与 a.zip, 或清单中重复的输出), 依次加上 " (1)" " (2)" 等后缀, 避免并行任务互相覆盖
+            base, ext = os.path.splitext(output_file)
+            counter = 1
+            while os.path.normcase(os.path.abspath(output_file)) in used_outputs:
+                output_file = f"{base} ({counter}){ext}"
+                counter += 1
+            if counter > 1:
+                print(f"警告：输出路径重复, {task['input']} 将输出到: {output_file}")
+            used_outputs.add(os.path.normcase(os.path.abspath(output_file)))
+            tasks.append({'input': task['input'], 'output': output_file, 'cover': args.cover})
+
+        engine = BatchHideEngine(self, jobs=args.jobs, copy_jobs=args.copy_jobs,
+                                 compress_jobs=args.compress_jobs, shortest_first=args.sjf)
+        engine.on_job_done = lambda done, total, result: print(
+            f"[{done}/{total}] {'完成' if result['status'] == 'ok' else '失败'}: {result['input']}")
+        results = engine.run(tasks, password=args.password, type_option_var=args.type)
+
+        for line in engine.summary_lines(results):
+            self.log(line)
+            print(line)
+        if any(result['status'] != 'ok' for result in results):
+            sys.exit(1)
+
+    def process_hidden_files_with_gui(self, root_dir, delete_original=True, jobs=None, per_device_jobs=None):
         """
         使用GUI界面批量处理目录中的隐写文件进行解除隐写
+        jobs/per_device_jobs 为并行任务数及每个磁盘的并发上限, 见 BatchRevealEngine
         """
         # 检查是否在CLI模式下运行（没有现有的root窗口）
         temp_root = None
@@ -3456,17 +5439,10 @@ class Steganographier:
             processed_count = 0
             success_count = 0
             
-            # 扫描和处理文件的逻辑保持不变
-            video_files = []
             progress_window.add_detail("正在扫描文件...")
             
             try:
-                for root, dirs, files in os.walk(root_dir):
-                    if progress_window.is_cancelled:
-                        break
-                    for file in files:
-                        if file.lower().endswith(('.mp4', '.mkv', '.mov', '.m4v', '.webm')):
-                            video_files.append(os.path.join(root, file))
+                video_files = collect_hidden_video_files(root_dir)
                 
                 total_files = len(video_files)
                 progress_window.add_detail(f"找到 {total_files} 个视频文件")
@@ -3476,30 +5452,28 @@ class Steganographier:
                     progress_window.processing_complete(0, 0)
                     return
                 
-                # 处理每个文件
-                for i, file_path in enumerate(video_files, 1):
+                engine = BatchRevealEngine(self, jobs=jobs, per_device_jobs=per_device_jobs)
+                progress_window.add_detail(f"并行任务数 {engine.jobs}, 每个磁盘并发 {engine.per_device_jobs}")
+
+                def on_job_done(done, total, result):
+                    nonlocal processed_count, success_count
                     if progress_window.is_cancelled:
-                        progress_window.add_detail("处理已被用户取消")
-                        break
-                    
-                    try:
-                        progress_window.update_progress(i-1, total_files, file_path)
-                        progress_window.add_detail(f"正在处理: {os.path.basename(file_path)}")
-                        
-                        self.reveal_file(input_file_path=file_path, 
-                                    password=None,
-                                    type_option_var=None,
-                                    delete_original=delete_original,
-                                    auto_rename_on_conflict=self.auto_rename_on_conflict)
-                        
-                        progress_window.add_detail(f"✓ 成功处理: {os.path.basename(file_path)}")
-                        success_count += 1
-                        
-                    except Exception as e:
-                        progress_window.add_detail(f"✗ 处理失败: {os.path.basename(file_path)} - {str(e)}")
-                    
+                        engine.cancel()
+                    if result['status'] == 'cancelled':
+                        return
                     processed_count += 1
-                    progress_window.update_progress(i, total_files)
+                    if result['status'] == 'ok':
+                        progress_window.add_detail(f"✓ 成功处理: {os.path.basename(result['input'])}")
+                        success_count += 1
+                    else:
+                        progress_window.add_detail(f"✗ 处理失败: {os.path.basename(result['input'])} - {result['error']}")
+                    progress_window.update_progress(done, total, result['input'])
+
+                engine.on_job_done = on_job_done
+                engine.run(video_files, delete_original=delete_original,
+                           auto_rename_on_conflict=self.auto_rename_on_conflict)
+                if progress_window.is_cancelled:
+                    progress_window.add_detail("处理已被用户取消")
                 
             except Exception as e:
                 progress_window.add_detail(f"扫描文件时出错: {str(e)}")
@@ -3524,36 +5498,23 @@ class Steganographier:
             temp_root.protocol("WM_DELETE_WINDOW", on_closing)
             temp_root.mainloop()
 
-    def process_hidden_files(self, root_dir, delete_original=True):
+    def process_hidden_files(self, root_dir, delete_original=True, jobs=None, per_device_jobs=None):
         """
         批量处理目录中的隐写文件进行解除隐写
         支持多种格式：MP4, MKV, MOV, M4V, WEBM等
+        jobs/per_device_jobs 为并行任务数及每个磁盘的并发上限, 见 BatchRevealEngine; 返回各文件的处理结果
         """
-        processed_count = 0
-        success_count = 0
-        
-        for root, dirs, files in os.walk(root_dir):
-            for file in files:
-                # 检查文件扩展名，支持多种视频格式
-                if file.lower().endswith(('.mp4', '.mkv', '.mov', '.m4v', '.webm')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        self.log(f"正在处理 {file_path}")
-                        # 直接调用reveal_file方法进行解除隐写
-                        # reveal_file方法会自动检测文件类型并选择合适的解压方法
-                        self.reveal_file(input_file_path=file_path, 
-                                    password=None,  # 使用默认密码文件
-                                    type_option_var=None,
-                                    delete_original=delete_original,
-                                    auto_rename_on_conflict=self.auto_rename_on_conflict)  # 自动检测文件类型
-                        self.log(f"处理 {file} 成功")
-                        success_count += 1
-                    except Exception as e:
-                        self.log(f"处理文件 {file_path} 时出错: {e}")
-                    finally:
-                        processed_count += 1
-        
-        self.log(f"批量处理完成: 总计处理 {processed_count} 个文件, 成功 {success_count} 个文件")
+        video_files = collect_hidden_video_files(root_dir)
+        engine = BatchRevealEngine(self, jobs=jobs, per_device_jobs=per_device_jobs)
+        # reveal_file 会自动检测文件类型并选择合适的解压方法, 密码使用默认密码文件
+        results = engine.run(video_files, delete_original=delete_original,
+                             auto_rename_on_conflict=self.auto_rename_on_conflict)
+
+        for line in engine.summary_lines(results):
+            self.log(line)
+        success_count = sum(1 for result in results if result['status'] == 'ok')
+        self.log(f"批量处理完成: 总计处理 {len(results)} 个文件, 成功 {success_count} 个文件")
+        return results
 
 
 
@@ -3584,7 +5545,8 @@ if __name__ == "__main__":
     is_cli_mode = len(sys.argv) > 1 and any(
         arg in sys.argv for arg in ['-i', '--input', '-r', '--reveal', 
                                     '-rd', '--reveal-dir', '-h', '--help',
-                                    '-o', '--output', '-p', '--password']
+                                    '-o', '--output', '-p', '--password',
+                                    '-b', '--batch', '--manifest']
     )
     
     # 根据模式显示/隐藏控制台
@@ -3612,6 +5574,14 @@ if __name__ == "__main__":
     parser.add_argument('--auto-rename', action='store_true', help='解除隐写遇到同名文件时自动改名')
     parser.add_argument('-pf', '--password-file', default=None, help='指定密码文件路径')
     parser.add_argument('--no-log', action='store_true', help='禁用日志文件')
+    parser.add_argument('--log-json', action='store_true', help='日志文件使用 JSON Lines 格式 (每行一条记录)')
+    parser.add_argument('-b', '--batch', action='store_true', help='批量隐写: -i 及其后的所有路径(支持通配符)都作为输入')
+    parser.add_argument('--manifest', default=None, help='批量隐写清单文件, 每行一个输入路径, 可用制表符分隔指定输出路径')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='批量隐写/批量解除隐写的并行任务数 (默认为CPU核心数)')
+    parser.add_argument('--per-device-jobs', type=int, default=None, help='批量解除隐写时同一磁盘上同时进行的任务数上限 (默认为2)')
+    parser.add_argument('--copy-jobs', type=int, default=None, help='批量隐写时同时复制外壳文件的任务数上限 (默认为2)')
+    parser.add_argument('--compress-jobs', type=int, default=None, help='批量隐写时同时压缩的任务数上限 (默认为CPU核心数)')
+    parser.add_argument('--sjf', action='store_true', help='批量隐写时按输入大小从小到大执行 (短作业优先)')
     parser.add_argument('-v', '--version', action='version', version=f'隐写者版本: {version_info}', help='显示版本号并退出')
 
     args, unknown = parser.parse_known_args()
@@ -3648,15 +5618,25 @@ if __name__ == "__main__":
         SteganographierGUI(reveal_files=normalized_files, version=version_info)
         sys.exit(0)
 
-    if unknown:
+    # 批量隐写模式: -i 及其余位置参数(支持通配符)和清单文件中的路径都作为输入
+    args.batch_tasks = None
+    if args.batch or args.manifest:
+        args.batch_tasks = collect_batch_hide_tasks(([args.input] if args.input else []) + unknown, args.manifest)
+        if not args.batch_tasks:
+            print('没有找到需要隐写的输入')
+            sys.exit(1)
+        args.input = args.batch_tasks[0]['input']  # 用于下面查找默认的外壳MP4文件
+    elif unknown:
         args.input = unknown[0]
 
     # CLI模式参数处理
     if args.input:
         print('CLI')
         # 首先调整传入的参数
-        # 1. 处理输出路径
-        if args.output is None:
+        # 1. 处理输出路径(批量模式下 -o 为输出文件夹, 在 run_batch_hide_cli 中处理)
+        if args.batch_tasks is not None:
+            pass
+        elif args.output is None:
             # 1.1 如果没有指定输出文件路径, 则默认和输入文件同路径, 使用原文件名+"_hidden.mp4/mkv"
             input_dir = os.path.dirname(os.path.abspath(args.input))
             args.output = os.path.join(input_dir, f"{os.path.splitext(os.path.basename(args.input))[0]}_hidden.{args.type}")
@@ -3700,7 +5680,8 @@ if __name__ == "__main__":
         steganographier = Steganographier(
             password_file=args.password_file,
             enable_log_file=enable_log, 
-            version=version_info
+            version=version_info,
+            log_json=args.log_json
         )
 
         print(args)
@@ -0,0 +1,70 @@
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Steganographier as S
+
+
+def write_records(writer, count):
+    """逐条提交记录并稍作等待, 让后台线程分多批写入, 每批之后都有机会轮转"""
+    for index in range(count):
+        writer.write(f"记录 {index}", job=index, stage='hide', bytes=index * 1024, duration=0.5)
+        time.sleep(0.002)
+    writer.close()
+
+
+def test_json_lines_valid_after_rotation(tmp_path):
+    path = str(tmp_path / 'steganographier_test.jsonl')
+    writer = S.AsyncLogWriter(path, json_lines=True, max_bytes=1000)
+    write_records(writer, 100)
+
+    archives = sorted(glob.glob(str(tmp_path / 'steganographier_test.*.jsonl.gz')))
+    assert archives, "没有发生轮转"
+    lines = []
+    for archive in archives:
+        with gzip.open(archive, 'rb') as f:
+            lines.extend(f.read().decode('utf-8').splitlines())
+    with open(path, 'rb') as f:
+        lines.extend(f.read().decode('utf-8').splitlines())
+
+    records = [json.loads(line) for line in lines]  # 带BOM时第一行会解析失败
+    assert sorted(record['job'] for record in records) == list(range(100))
+
+
+def test_text_log_keeps_bom(tmp_path):
+    path = str(tmp_path / 'steganographier_test.log')
+    writer = S.AsyncLogWriter(path)
+    write_records(writer, 3)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data.startswith(b'\xef\xbb\xbf')
+    assert data.count(b'\xef\xbb\xbf') == 1
+
+
+def test_records_kept_after_failed_reopen(tmp_path, monkeypatch):
+    path = str(tmp_path / 'steganographier_test.jsonl')
+    writer = S.AsyncLogWriter(path, json_lines=True, max_bytes=1000)
+    original_open = writer._open
+    calls = []
+
+    def flaky_open(mode):
+        # 轮转时第一次重新打开文件失败, 文件保持关闭状态
+        calls.append(mode)
+        if len(calls) == 1:
+            raise OSError('模拟打开失败')
+        return original_open(mode)
+
+    monkeypatch.setattr(writer, '_open', flaky_open)
+    write_records(writer, 100)
+
+    lines = []
+    for log_path in glob.glob(str(tmp_path / 'steganographier_test*.jsonl*')):
+        opener = gzip.open if log_path.endswith('.gz') else open
+        with opener(log_path, 'rb') as f:
+            lines.extend(f.read().decode('utf-8').splitlines())
+    assert sorted(json.loads(line)['job'] for line in lines) == list(range(100))
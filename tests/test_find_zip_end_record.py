@@ -0,0 +1,48 @@
+import os
+import sys
+import zipfile
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Steganographier as S
+
+GiB = 1024 ** 3
+
+
+def write_trailing_zip(path, zip_offset):
+    """在稀疏文件的 zip_offset 处写入一个附加在末尾的ZIP(偏移量以文件开头为基准, 与mp4模式一致), 之后追加随机化数据"""
+    with open(path, 'wb') as f:
+        f.write(b'\x00\x00\x00\x18ftypisom')
+        f.seek(zip_offset)
+        writer = S.ZipStreamWriter(f)
+        writer.begin_member('a.txt', (2020, 1, 1, 0, 0, 0), zipfile.ZIP_STORED, 5)
+        writer.write(b'hello')
+        writer.end_member(zlib.crc32(b'hello'))
+        writer.close()
+        cd_end = f.tell()
+        f.write(os.urandom(4096))
+    return cd_end
+
+
+# 中央目录位于 2~4GiB 之间时会写入 ZIP64 记录, 但普通目录结束记录中仍是实际数值
+@pytest.mark.parametrize('zip_offset', [int(1.5 * GiB), int(2.2 * GiB), int(4.5 * GiB)])
+def test_trailing_zip_detected_around_zip64_limit(tmp_path, zip_offset):
+    path = str(tmp_path / 'hidden.mp4')
+    write_trailing_zip(path, zip_offset)
+
+    with open(path, 'rb') as f:
+        end_record = S.find_zip_end_record(f, os.path.getsize(path))
+    assert end_record == {'base': 0, 'cd_offset': zip_offset + 30 + 5 + len('a.txt'), 'entries': 1}
+    assert S.probe_hidden_container(path) == {'type': 'mp4_trailing', 'zip_offset': 0}
+
+
+def test_zip64_end_record_near_file_start(tmp_path):
+    # 目录结束记录之前不足 ZIP64 记录和定位器的长度时, 不能向文件开头之前定位
+    path = str(tmp_path / 'tiny.bin')
+    with open(path, 'wb') as f:
+        f.write(b'PK\x05\x06' + bytes(4) + b'\xff\xff' * 2 + b'\xff\xff\xff\xff' * 2 + bytes(2))
+
+    with open(path, 'rb') as f:
+        assert S.find_zip_end_record(f, os.path.getsize(path)) is None